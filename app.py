@@ -1,16 +1,25 @@
 import streamlit as st
-import pandas as pd
 from datetime import datetime
-import io
-from models.reporte import ReporteConsolidado
+from models.asistencia import ReporteAsistencia
 from services.archivos import ArchivosService
 from services.reporte import ReporteService
 from services.chat_ia import ChatIAService
+from services.exportacion import ExportacionService
+from utils.instrumentacion import (
+    instrumentacion_activa, limpiar_mediciones, mediciones_a_dataframe,
+    medir_en_sesion, obtener_mediciones
+)
 import sys
 import os
+import re
+import uuid
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+# Desde Streamlit 1.45, download_button acepta una función y solo la llama al
+# hacer clic; en las anteriores el archivo se genera al mostrar el botón
+DESCARGA_DIFERIDA = tuple(int(parte) for parte in re.findall(r'\d+', st.__version__)[:2]) >= (1, 45)
+
 def configurar_pagina():
     """Configuración inicial de la página Streamlit"""
     st.set_page_config(
@@ -182,6 +191,36 @@ def cargar_archivos_sidebar(archivos_service: ArchivosService) -> tuple:
     
     return archivos, api_key_usuario
 
+def configurar_diagnostico():
+    """Casilla del sidebar para medir las etapas del procesamiento de esta sesión"""
+    if "id_diagnostico" not in st.session_state:
+        st.session_state.id_diagnostico = uuid.uuid4().hex
+    with st.sidebar:
+        st.markdown("---")
+        activa = st.checkbox(
+            "🩺 Diagnóstico de rendimiento",
+            key="diagnostico_activo",
+            help="Mide tiempo y filas de cada etapa en tu sesión. Hace el procesamiento algo más lento."
+        )
+    # La bandera es del hilo de esta ejecución: no afecta a otras sesiones
+    medir_en_sesion(st.session_state.id_diagnostico if activa else None)
+
+def mostrar_panel_diagnostico():
+    """Muestra en el sidebar las mediciones más recientes de cada etapa (solo de esta sesión)"""
+    if not instrumentacion_activa():
+        return
+    sesion = st.session_state.id_diagnostico
+    with st.sidebar:
+        with st.expander("⏱️ Tiempos por etapa", expanded=True):
+            mediciones = obtener_mediciones(sesion)
+            if not mediciones:
+                st.caption("Aún no hay mediciones. Carga los archivos para generar el reporte.")
+                return
+            st.dataframe(mediciones_a_dataframe(mediciones[:50]), use_container_width=True, hide_index=True)
+            if st.button("Limpiar mediciones", use_container_width=True):
+                limpiar_mediciones(sesion)
+                st.rerun()
+
 def mostrar_estado_archivos(archivos: dict):
     """Muestra el estado de los archivos cargados"""
     col1, col2, col3, col4 = st.columns(4)
@@ -212,10 +251,10 @@ def mostrar_estado_archivos(archivos: dict):
     
     st.markdown("---")
 
-def mostrar_reporte(reporte: ReporteConsolidado):
+def mostrar_reporte(reporte: ReporteAsistencia):
     """Muestra el reporte consolidado en la interfaz"""
-    # Convertir el modelo a DataFrame para mostrar
-    df_reporte = pd.DataFrame([vars(e) for e in reporte.empleados])
+    # El reporte ya es columnar: se usa su DataFrame sin copiarlo
+    df_reporte = reporte.datos
     
     # Mostrar métricas generales
     st.subheader("📈 Resumen General")
@@ -223,7 +262,7 @@ def mostrar_reporte(reporte: ReporteConsolidado):
     col1, col2, col3, col4, col5 = st.columns(5)
     
     with col1:
-        st.metric("Total Empleados", len(reporte.empleados))
+        st.metric("Total Empleados", reporte.total_empleados)
     
     with col2:
         st.metric("Total Días Trabajados", reporte.total_dias_trabajados)
@@ -237,6 +276,12 @@ def mostrar_reporte(reporte: ReporteConsolidado):
     with col5:
         st.metric("Registros Mal", reporte.total_registro_mal)
 
+    if reporte.nombres_duplicados:
+        detalle = "; ".join(
+            f"{fuente}: {', '.join(nombres)}" for fuente, nombres in reporte.nombres_duplicados.items()
+        )
+        st.warning(f"⚠️ Nombres repetidos con datos distintos (se conservan todas las filas; revisa si son empleados distintos): {detalle}")
+
     st.markdown("---")
 
     # Mostrar tabla del reporte
@@ -251,13 +296,13 @@ def mostrar_reporte(reporte: ReporteConsolidado):
         mostrar_todos = st.checkbox("Mostrar todos los empleados", value=True)
 
     # Aplicar filtros
-    df_filtrado = df_reporte.copy()
+    df_filtrado = df_reporte
     if filtro_nombre and not mostrar_todos:
         df_filtrado = df_filtrado[df_filtrado['nombre'].str.contains(filtro_nombre, case=False, na=False)]
 
-    # Mostrar tabla
+    # Mostrar tabla (las duraciones se guardan en minutos y se muestran como HH:MM)
     st.dataframe(
-        df_filtrado,
+        ReporteService.formatear_reporte(df_filtrado),
         use_container_width=True,
         hide_index=True,
         column_config={
@@ -273,26 +318,38 @@ def mostrar_reporte(reporte: ReporteConsolidado):
         }
     )
 
-    # Botón para descargar reporte
+    with st.expander("🧮 Uso de memoria del reporte", expanded=False):
+        uso_memoria = ReporteService.uso_memoria(df_reporte)
+        st.caption(f"Total: {uso_memoria['bytes'].sum() / 1024:.1f} KB")
+        st.dataframe(uso_memoria, use_container_width=True)
+
+    # Botón para descargar reporte (se genera al hacer clic y queda en caché)
     st.markdown("---")
     col1, col2, col3 = st.columns([1, 1, 1])
     
     with col2:
-        # Crear archivo Excel para descarga
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            df_reporte.to_excel(writer, sheet_name='Reporte_Asistencias', index=False)
+        formatos = ExportacionService.formatos_disponibles()
+        formato = st.radio(
+            "Formato de descarga:",
+            formatos,
+            format_func=lambda f: {'xlsx': 'Excel', 'csv': 'CSV', 'parquet': 'Parquet'}[f],
+            horizontal=True
+        )
+        generar = lambda: ExportacionService.exportar(reporte, formato)
         
         st.download_button(
-            label="📥 Descargar Reporte Excel",
-            data=output.getvalue(),
-            file_name=f"reporte_asistencias_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            label="📥 Descargar Reporte Excel" if formato == 'xlsx' else f"📥 Descargar Reporte {formato.upper()}",
+            data=generar if DESCARGA_DIFERIDA else generar(),
+            file_name=ExportacionService.nombre_archivo(formato, datetime.now().strftime('%Y%m%d_%H%M%S')),
+            mime=ExportacionService.tipo_mime(formato),
             use_container_width=True
         )
 
 def mostrar_mensaje_chat(role: str, message):
-    """Muestra mensajes del chat con formato mejorado"""
+    """Muestra mensajes del chat con formato mejorado.
+
+    Para un mensaje 'ia_en_progreso' devuelve el contenedor donde se muestra el código parcial.
+    """
     if role == "user":
         st.markdown(f"""
         <div class="chat-message-user">
@@ -300,7 +357,15 @@ def mostrar_mensaje_chat(role: str, message):
         </div>
         """, unsafe_allow_html=True)
     else:
-        if isinstance(message, dict) and message.get('tipo') == 'ia_analysis':
+        if isinstance(message, dict) and message.get('tipo') == 'ia_en_progreso':
+            # Respuesta que aún se está generando: el código se va escribiendo en el contenedor
+            st.markdown("""
+            <div class="chat-message-ai">
+                <strong>🤖 Generando consulta...</strong>
+            </div>
+            """, unsafe_allow_html=True)
+            return st.empty()
+        elif isinstance(message, dict) and message.get('tipo') == 'ia_analysis':
             # Respuesta de IA estructurada
             st.markdown(f"""
             <div class="chat-message-ai">
@@ -386,6 +451,7 @@ def main():
     
     # Cargar archivos desde sidebar y obtener API key
     archivos, api_key_usuario = cargar_archivos_sidebar(archivos_service)
+    configurar_diagnostico()
     
     # Inicializar chat IA service - CAMBIO AQUÍ
     chat_ia_service = None
@@ -404,11 +470,14 @@ def main():
     if archivos_service.validar_archivos_cargados(*archivos.values()):
         with st.spinner('Procesando archivos...'):
             try:
-                # Cargar y procesar archivos
-                df_horas = archivos_service.cargar_archivo_excel(archivos['horas'])
-                df_diferencia = archivos_service.cargar_archivo_excel(archivos['diferencia'])
-                df_retardos = archivos_service.cargar_archivo_excel(archivos['retardos'])
-                df_tiempo_extra = archivos_service.cargar_archivo_excel(archivos['tiempo_extra'])
+                # Cargar y procesar archivos (en paralelo cuando vale la pena)
+                libros, errores_carga = archivos_service.cargar_libros_paralelo(archivos)
+                for clave, error in errores_carga.items():
+                    st.error(f"❌ {clave}: {error}")
+                df_horas = libros.get('horas')
+                df_diferencia = libros.get('diferencia')
+                df_retardos = libros.get('retardos')
+                df_tiempo_extra = libros.get('tiempo_extra')
                 
                 if all(df is not None for df in [df_horas, df_diferencia, df_retardos, df_tiempo_extra]):
                     # Generar reporte consolidado
@@ -433,11 +502,27 @@ def main():
     else:
         mostrar_instrucciones()
 
-def mostrar_chat_ia(chat_ia_service: ChatIAService, reporte: ReporteConsolidado):
+    mostrar_panel_diagnostico()
+
+def responder_pregunta(chat_ia_service: ChatIAService, pregunta: str, reporte: ReporteAsistencia, mensaje_espera: str):
+    """Genera la respuesta mostrando el código conforme llega y la agrega al historial"""
+    with st.spinner(mensaje_espera):
+        contenedor = mostrar_mensaje_chat("assistant", {'tipo': 'ia_en_progreso'})
+        respuesta = chat_ia_service.generar_consulta_ia(
+            pregunta, reporte.datos,
+            al_recibir=lambda codigo: contenedor.code(codigo, language='python'),
+            huella=reporte.huella
+        )
+        st.session_state.chat_history.append(("assistant", {
+            'tipo': 'ia_analysis',
+            'codigo': respuesta[2],
+            'texto': respuesta[0],
+            'dataframe': respuesta[1]
+        }))
+
+def mostrar_chat_ia(chat_ia_service: ChatIAService, reporte: ReporteAsistencia):
     """Muestra la interfaz del chat de IA - CAMBIO: Removido api_key del parámetro"""
-    # Convertir el modelo a DataFrame para el chat
-    df_reporte = pd.DataFrame([vars(e) for e in reporte.empleados])
-    
+    ChatIAService.preparar_ejecucion()
     st.markdown("---")
     
     # Header del chat
@@ -484,60 +569,28 @@ def mostrar_chat_ia(chat_ia_service: ChatIAService, reporte: ReporteConsolidado)
         if st.button("📊 Resumen General", use_container_width=True):
             pregunta = "Dame un resumen general del reporte de asistencias con los principales hallazgos y estadísticas importantes"
             st.session_state.chat_history.append(("user", pregunta))
-            with st.spinner("🔍 Analizando datos..."):
-                # CAMBIO: Removido api_key del parámetro
-                respuesta = chat_ia_service.generar_consulta_ia(pregunta, df_reporte)
-                st.session_state.chat_history.append(("assistant", {
-                    'tipo': 'ia_analysis',
-                    'codigo': respuesta[2],
-                    'texto': respuesta[0],
-                    'dataframe': respuesta[1]
-                }))
+            responder_pregunta(chat_ia_service, pregunta, reporte, "🔍 Analizando datos...")
             st.rerun()
     
     with col2:
         if st.button("⚠️ Alertas Críticas", use_container_width=True):
             pregunta = "Identifica empleados con problemas críticos de asistencia, puntualidad o registro. Dame nombres específicos y qué acciones recomiendas"
             st.session_state.chat_history.append(("user", pregunta))
-            with st.spinner("🔍 Identificando problemas..."):
-                # CAMBIO: Removido api_key del parámetro
-                respuesta = chat_ia_service.generar_consulta_ia(pregunta, df_reporte)
-                st.session_state.chat_history.append(("assistant", {
-                    'tipo': 'ia_analysis',
-                    'codigo': respuesta[2],
-                    'texto': respuesta[0],
-                    'dataframe': respuesta[1]
-                }))
+            responder_pregunta(chat_ia_service, pregunta, reporte, "🔍 Identificando problemas...")
             st.rerun()
     
     with col3:
         if st.button("🏆 Top Performers", use_container_width=True):
             pregunta = "¿Cuáles son los empleados con mejor desempeño en asistencia y puntualidad? Dame un ranking de los top 5"
             st.session_state.chat_history.append(("user", pregunta))
-            with st.spinner("🔍 Evaluando desempeño..."):
-                # CAMBIO: Removido api_key del parámetro
-                respuesta = chat_ia_service.generar_consulta_ia(pregunta, df_reporte)
-                st.session_state.chat_history.append(("assistant", {
-                    'tipo': 'ia_analysis',
-                    'codigo': respuesta[2],
-                    'texto': respuesta[0],
-                    'dataframe': respuesta[1]
-                }))
+            responder_pregunta(chat_ia_service, pregunta, reporte, "🔍 Evaluando desempeño...")
             st.rerun()
     
     with col4:
         if st.button("📈 Métricas Clave", use_container_width=True):
             pregunta = "Calcula y presenta las métricas más importantes: promedios, porcentajes, tendencias y comparaciones entre empleados"
             st.session_state.chat_history.append(("user", pregunta))
-            with st.spinner("🔍 Calculando métricas..."):
-                # CAMBIO: Removido api_key del parámetro
-                respuesta = chat_ia_service.generar_consulta_ia(pregunta, df_reporte)
-                st.session_state.chat_history.append(("assistant", {
-                    'tipo': 'ia_analysis',
-                    'codigo': respuesta[2],
-                    'texto': respuesta[0],
-                    'dataframe': respuesta[1]
-                }))
+            responder_pregunta(chat_ia_service, pregunta, reporte, "🔍 Calculando métricas...")
             st.rerun()
     
     # Mostrar historial de chat
@@ -560,15 +613,7 @@ def mostrar_chat_ia(chat_ia_service: ChatIAService, reporte: ReporteConsolidado)
         if st.button("🚀 Analizar", use_container_width=True, type="primary"):
             if nueva_pregunta.strip():
                 st.session_state.chat_history.append(("user", nueva_pregunta))
-                with st.spinner("🤖 Generando análisis..."):
-                    # CAMBIO: Removido api_key del parámetro
-                    respuesta = chat_ia_service.generar_consulta_ia(nueva_pregunta, df_reporte)
-                    st.session_state.chat_history.append(("assistant", {
-                        'tipo': 'ia_analysis',
-                        'codigo': respuesta[2],
-                        'texto': respuesta[0],
-                        'dataframe': respuesta[1]
-                    }))
+                responder_pregunta(chat_ia_service, nueva_pregunta, reporte, "🤖 Generando análisis...")
                 st.rerun()
     
     # Botones de acción
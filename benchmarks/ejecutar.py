@@ -0,0 +1,237 @@
+"""Mide el tiempo de cada etapa del reporte con datos sintéticos de varios tamaños.
+
+Las etapas medidas usan solo la API pública: cargar_archivo_excel (parseando
+el Excel y desde la caché en disco), limpiar_dataframe,
+generar_reporte_consolidado junto con cada una de sus etapas (_procesar_*,
+_consolidar_dataframes, _compactar_tipos, tomadas de utils.instrumentacion) y
+ExportacionService.exportar en cada formato disponible, vaciando las cachés
+antes de cada repetición. Los resultados se
+guardan en `benchmarks/resultados/` y se comparan con la ejecución anterior
+(o con la indicada en --comparar) para detectar regresiones.
+
+Uso:
+    python -m benchmarks.ejecutar [--tamanos 100 1000 10000 100000] [--repeticiones 3]
+                                  [--comparar RUTA] [--umbral 0.2] [--fallar-si-regresion]
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import warnings
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+from benchmarks.generador import escribir_conjunto
+from services.archivos import ArchivosService
+from services.exportacion import ExportacionService
+from services.reporte import ReporteService
+from utils.config import Config
+from utils.excel import obtener_lector_excel
+from utils.instrumentacion import limpiar_mediciones, medir_en_sesion, obtener_mediciones
+from utils.validacion import limpiar_dataframe
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+DIRECTORIO_DATOS = os.path.join(DIRECTORIO, 'datos_sinteticos')
+DIRECTORIO_RESULTADOS = os.path.join(DIRECTORIO, 'resultados')
+TAMANOS = [100, 1000, 10000, 100000]
+
+# Diferencia absoluta mínima para considerar una regresión (evita ruido en etapas muy cortas)
+MINIMO_SEGUNDOS = 0.005
+
+# Etapas instrumentadas del reporte (nombre en utils.instrumentacion -> nombre en los resultados)
+ETAPAS_REPORTE = {
+    'reporte.generar_reporte_consolidado': 'generar_reporte_consolidado',
+    'reporte.procesar_horas': '_procesar_horas',
+    'reporte.procesar_diferencias': '_procesar_diferencias',
+    'reporte.procesar_retardos': '_procesar_retardos',
+    'reporte.procesar_tiempo_extra': '_procesar_tiempo_extra',
+    'reporte.consolidar_dataframes': '_consolidar_dataframes',
+    'reporte.compactar_tipos': '_compactar_tipos'
+}
+SESION_BENCHMARK = 'benchmark'
+
+warnings.filterwarnings('ignore', message='Workbook contains no default style')
+# Las mediciones se leen con obtener_mediciones; no hace falta su línea JSON en stderr
+logging.getLogger('asistencia.instrumentacion').setLevel(logging.WARNING)
+
+def _resumir(tiempos: List[float]) -> Dict[str, float]:
+    return {'min': round(min(tiempos), 6), 'mediana': round(statistics.median(tiempos), 6)}
+
+def medir(funcion: Callable, repeticiones: int, preparar: Optional[Callable] = None) -> Dict[str, float]:
+    """Ejecuta `funcion` varias veces y devuelve el mínimo y la mediana en segundos"""
+    tiempos = []
+    for _ in range(repeticiones):
+        if preparar is not None:
+            preparar()
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return _resumir(tiempos)
+
+def medir_etapas(
+    funcion: Callable,
+    etapas: Dict[str, str],
+    repeticiones: int,
+    preparar: Optional[Callable] = None
+) -> Dict[str, Dict[str, float]]:
+    """Ejecuta `funcion` midiendo en este hilo y devuelve el mínimo y la mediana de cada etapa instrumentada"""
+    tiempos: Dict[str, List[float]] = {nombre: [] for nombre in etapas.values()}
+    for _ in range(repeticiones):
+        if preparar is not None:
+            preparar()
+        limpiar_mediciones(SESION_BENCHMARK)
+        medir_en_sesion(SESION_BENCHMARK)
+        try:
+            funcion()
+        finally:
+            medir_en_sesion(None)
+        por_etapa = dict.fromkeys(tiempos, 0.0)
+        for medicion in obtener_mediciones(SESION_BENCHMARK):
+            if medicion.etapa in etapas:
+                por_etapa[etapas[medicion.etapa]] += medicion.segundos
+        for nombre, segundos in por_etapa.items():
+            tiempos[nombre].append(segundos)
+    limpiar_mediciones(SESION_BENCHMARK)
+    return {nombre: _resumir(valores) for nombre, valores in tiempos.items()}
+
+def obtener_conjunto(empleados: int, dias: int, semilla: int) -> Dict[str, str]:
+    """Rutas del conjunto sintético; se genera solo la primera vez"""
+    directorio = os.path.join(DIRECTORIO_DATOS, f"e{empleados}_d{dias}_s{semilla}")
+    rutas = ArchivosService.clasificar_archivos(glob.glob(os.path.join(directorio, '*.xlsx')))
+    if len(rutas) < 4:
+        rutas = escribir_conjunto(directorio, empleados, dias, semilla)
+    return rutas
+
+def medir_tamano(empleados: int, dias: int, repeticiones: int, semilla: int = 0) -> Dict[str, Dict[str, float]]:
+    """Mide todas las etapas para un número de empleados"""
+    rutas = obtener_conjunto(empleados, dias, semilla)
+    contenidos = {tipo: ArchivosService.leer_contenido(ruta) for tipo, ruta in rutas.items()}
+    lector = obtener_lector_excel(Config().MOTOR_EXCEL)
+    servicio = ReporteService()
+    resultados = {}
+
+    resultados['cargar_archivo_excel'] = medir(
+        lambda: ArchivosService.cargar_archivo_excel(contenidos['horas']),
+        repeticiones, preparar=lambda: ArchivosService.limpiar_cache(disco=True)
+    )
+
+    # Misma carga, pero desde la copia Arrow en disco que dejó la medición anterior
+    resultados['cargar_archivo_excel_disco'] = medir(
+        lambda: ArchivosService.cargar_archivo_excel(contenidos['horas']),
+        repeticiones, preparar=ArchivosService.limpiar_cache
+    )
+
+    df_crudo = lector(contenidos['horas'], 0)
+    resultados['limpiar_dataframe'] = medir(lambda: limpiar_dataframe(df_crudo), repeticiones)
+
+    libros = {tipo: ArchivosService.cargar_libro_excel(contenido) for tipo, contenido in contenidos.items()}
+    generar = lambda: servicio.generar_reporte_consolidado(
+        libros['horas'], libros['diferencia'], libros['retardos'], libros['tiempo_extra']
+    )
+    # El total y cada etapa en la misma ejecución, con las cachés de reportes y etapas vacías
+    resultados.update(medir_etapas(
+        generar, ETAPAS_REPORTE, repeticiones, preparar=ReporteService.limpiar_cache
+    ))
+
+    reporte = generar()
+    for formato in ExportacionService.formatos_disponibles():
+        resultados[f'exportacion_{formato}'] = medir(
+            lambda: ExportacionService.exportar(reporte, formato),
+            repeticiones, preparar=ExportacionService.limpiar_cache
+        )
+    return resultados
+
+def commit_actual() -> Optional[str]:
+    """Commit de git del árbol medido, si está disponible"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=DIRECTORIO,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def ultimo_resultado() -> Optional[str]:
+    """Ruta del resultado guardado más reciente"""
+    rutas = sorted(glob.glob(os.path.join(DIRECTORIO_RESULTADOS, '*.json')))
+    return rutas[-1] if rutas else None
+
+def comparar(actual: Dict, anterior: Dict, umbral: float) -> List[str]:
+    """Lista las etapas cuya mediana empeoró más que el umbral respecto a la ejecución anterior"""
+    regresiones = []
+    for tamano, etapas in actual['resultados'].items():
+        etapas_anteriores = anterior.get('resultados', {}).get(tamano, {})
+        for etapa, tiempos in etapas.items():
+            previo = etapas_anteriores.get(etapa)
+            if previo is None:
+                continue
+            antes, ahora = previo['mediana'], tiempos['mediana']
+            if ahora > antes * (1 + umbral) and ahora - antes > MINIMO_SEGUNDOS:
+                regresiones.append(
+                    f"{etapa} ({tamano} empleados): {antes * 1000:.1f} ms -> {ahora * 1000:.1f} ms "
+                    f"(+{(ahora / antes - 1) * 100:.0f}%)"
+                )
+    return regresiones
+
+def imprimir_tabla(resultados: Dict[str, Dict[str, Dict[str, float]]]) -> None:
+    """Muestra la mediana (ms) de cada etapa por tamaño"""
+    tabla = pd.DataFrame({
+        tamano: {etapa: tiempos['mediana'] * 1000 for etapa, tiempos in etapas.items()}
+        for tamano, etapas in resultados.items()
+    })
+    print(tabla.round(2).to_string())
+
+def main(argumentos: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks del procesamiento de reportes")
+    parser.add_argument('--tamanos', type=int, nargs='+', default=TAMANOS, help="Números de empleados")
+    parser.add_argument('--dias', type=int, default=15)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--comparar', help="Resultado contra el cual comparar (por defecto, el último guardado)")
+    parser.add_argument('--umbral', type=float, default=0.2, help="Aumento relativo que cuenta como regresión")
+    parser.add_argument('--no-guardar', action='store_true', help="No guarda el resultado de esta ejecución")
+    parser.add_argument('--fallar-si-regresion', action='store_true', help="Termina con código 1 si hay regresiones")
+    args = parser.parse_args(argumentos)
+
+    resultados = {}
+    for empleados in args.tamanos:
+        print(f"Midiendo {empleados} empleados...", file=sys.stderr)
+        resultados[str(empleados)] = medir_tamano(empleados, args.dias, args.repeticiones)
+
+    actual = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit_actual(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'motor_excel': Config().MOTOR_EXCEL,
+        'dias': args.dias,
+        'repeticiones': args.repeticiones,
+        'resultados': resultados
+    }
+    imprimir_tabla(resultados)
+
+    ruta_anterior = args.comparar or ultimo_resultado()
+    regresiones = []
+    if ruta_anterior:
+        with open(ruta_anterior, encoding='utf-8') as f:
+            regresiones = comparar(actual, json.load(f), args.umbral)
+        print(f"\nComparado con {os.path.basename(ruta_anterior)}:")
+        print("\n".join(regresiones) if regresiones else "Sin regresiones")
+
+    if not args.no_guardar:
+        os.makedirs(DIRECTORIO_RESULTADOS, exist_ok=True)
+        nombre = f"{datetime.now():%Y%m%d-%H%M%S}-{actual['commit'] or 'local'}.json"
+        with open(os.path.join(DIRECTORIO_RESULTADOS, nombre), 'w', encoding='utf-8') as f:
+            json.dump(actual, f, ensure_ascii=False, indent=2)
+
+    return 1 if regresiones and args.fallar_si_regresion else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,208 @@
+"""Genera conjuntos sintéticos de reportes quincenales con el formato de `datos/`.
+
+Cada conjunto son 4 libros (horas trabajadas, diferencia, retardos y tiempo
+extra) con el título en la fila 1, los encabezados en la fila 3, columnas de
+días numéricas separadas por columnas vacías (como las celdas combinadas del
+original), celdas 'HH:MM' o códigos F / N/L / J, las columnas 'Tiempo\\nTotal',
+'Días', 'Faltas' y 'Total de\\nHoras', y el pie con "Página N".
+
+Uso:
+    python -m benchmarks.generador SALIDA --empleados 1000 [--dias 15] [--semilla 0]
+"""
+import argparse
+import io
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import numpy as np
+import xlsxwriter
+
+from models.asistencia import EstadoDia
+from utils.tiempo import minutos_a_tiempo
+
+TITULOS_ARCHIVO = {
+    'horas': 'horas trabajadas',
+    'diferencia': 'diferencia',
+    'retardos': 'retardos',
+    'tiempo_extra': 'tiempo extra'
+}
+
+NOMBRES = [
+    'ALMA', 'ANDRES', 'BLANCA', 'CARLOS', 'CITLALLI', 'DANIELA', 'EDGAR', 'EDUARDO',
+    'ERICK', 'EVA', 'FABIOLA', 'GUADALUPE', 'HORACIO', 'IDANIA', 'JADE', 'JAZMIN',
+    'JESUS', 'JUAN', 'KEILLY', 'LAURA', 'LESLY', 'LIZBETH', 'MARCOS', 'MARIA',
+    'MARIANA', 'MIRIAM', 'MITZY', 'PABLO', 'PERLA', 'RAMIRO', 'SEBASTIAN', 'SONIA'
+]
+APELLIDOS = [
+    'AGUILAR', 'BADILLO', 'BARRON', 'CABRERA', 'CANALES', 'CARPIO', 'CRUZ', 'DIAZ',
+    'DOMINGUEZ', 'ESPINOZA', 'FLORES', 'FRANCO', 'GOMEZ', 'GUTIERREZ', 'HERNANDEZ', 'HURTADO',
+    'IBARRA', 'JUAREZ', 'LARA', 'LOPEZ', 'MARTINEZ', 'MENDEZ', 'MONROY', 'MUÑOZ',
+    'ORTIZ', 'PACHECO', 'PEREZ', 'RAMIREZ', 'RODRIGUEZ', 'ROMERO', 'SANCHEZ', 'VARGAS'
+]
+
+# Columnas vacías después de cada día, imitando las celdas combinadas del original
+_ESPACIOS_DIAS = [1, 0, 0, 1, 0, 2, 1, 0, 3, 0, 0, 2, 1, 0, 1, 0]
+
+# Probabilidad de cada estado diario: trabajado, falta, descanso, justificado, vacío
+_PROBABILIDADES_ESTADO = [0.72, 0.12, 0.13, 0.02, 0.01]
+_ESTADOS = np.array([EstadoDia.TRABAJADO, EstadoDia.FALTA, EstadoDia.DESCANSO,
+                     EstadoDia.JUSTIFICADO, EstadoDia.VACIO], dtype=np.int8)
+_CODIGOS = {EstadoDia.FALTA: 'F', EstadoDia.DESCANSO: 'N/L', EstadoDia.JUSTIFICADO: 'J'}
+
+JORNADA_MINUTOS = 480
+
+def generar_nombres(empleados: int, rng: np.random.Generator) -> np.ndarray:
+    """Nombres únicos de dos nombres y dos apellidos, con el espacio inicial del original"""
+    base = len(NOMBRES) * len(NOMBRES) * len(APELLIDOS) * len(APELLIDOS)
+    if empleados > base:
+        raise ValueError(f"Solo se pueden generar {base} nombres distintos")
+    indices = rng.choice(base, size=empleados, replace=False)
+    nombre1, resto = np.divmod(indices, len(NOMBRES) * len(APELLIDOS) * len(APELLIDOS))
+    nombre2, resto = np.divmod(resto, len(APELLIDOS) * len(APELLIDOS))
+    apellido1, apellido2 = np.divmod(resto, len(APELLIDOS))
+    partes = [np.array(NOMBRES)[nombre1], np.array(NOMBRES)[nombre2],
+              np.array(APELLIDOS)[apellido1], np.array(APELLIDOS)[apellido2]]
+    return np.sort(np.array([' ' + ' '.join(p) for p in zip(*partes)], dtype=object))
+
+def _celdas(estados: np.ndarray, minutos: np.ndarray) -> np.ndarray:
+    """Texto de cada celda de día: 'HH:MM' si se trabajó, el código o vacío si no"""
+    texto = minutos_a_tiempo(minutos.ravel()).to_numpy(dtype=object).reshape(minutos.shape)
+    for estado, codigo in _CODIGOS.items():
+        texto[estados == estado] = codigo
+    texto[estados == EstadoDia.VACIO] = None
+    return texto
+
+def generar_datos(empleados: int, dias: int = 15, semilla: int = 0) -> Dict[str, Dict[str, np.ndarray]]:
+    """Genera las celdas y totales de los 4 reportes de forma coherente entre sí"""
+    rng = np.random.default_rng(semilla)
+    nombres = generar_nombres(empleados, rng)
+    forma = (empleados, dias)
+    estados = rng.choice(_ESTADOS, size=forma, p=_PROBABILIDADES_ESTADO)
+    trabajado = estados == EstadoDia.TRABAJADO
+
+    # Retardo de entrada (minutos) con algunos retardos reales de 10 a 40 minutos
+    retardo = np.rint(rng.normal(0, 4, forma)).astype(np.int64)
+    tarde = rng.random(forma) < 0.08
+    retardo[tarde] = rng.integers(10, 41, tarde.sum())
+
+    # Minutos trabajados; algunos turnos cortos producen registros mal (<= -120)
+    horas = np.rint(rng.normal(JORNADA_MINUTOS + 10, 35, forma)).astype(np.int64)
+    corto = rng.random(forma) < 0.05
+    horas[corto] = rng.integers(120, 330, corto.sum())
+    diferencia = horas - JORNADA_MINUTOS
+    tiempo_extra = diferencia + retardo
+
+    total_horas = minutos_a_tiempo(np.where(trabajado, horas, 0).sum(axis=1)).to_numpy(dtype=object)
+    faltas = (estados == EstadoDia.FALTA).sum(axis=1)
+
+    def reporte(minutos: np.ndarray, tiempo_total: np.ndarray, dias_contados: np.ndarray):
+        return {
+            'celdas': _celdas(estados, minutos),
+            'tiempo_total': tiempo_total,
+            'dias': dias_contados.astype(float),
+            'faltas': faltas.astype(float),
+            'total_horas': total_horas
+        }
+
+    def suma(minutos: np.ndarray) -> np.ndarray:
+        return minutos_a_tiempo(np.where(trabajado, minutos, 0).sum(axis=1)).to_numpy(dtype=object)
+
+    datos = {
+        'horas': reporte(horas, np.full(empleados, '00:00', dtype=object), trabajado.sum(axis=1)),
+        'diferencia': reporte(diferencia, suma(diferencia), (trabajado & (diferencia <= -120)).sum(axis=1)),
+        'retardos': reporte(retardo, suma(retardo), (trabajado & (retardo >= 10)).sum(axis=1)),
+        'tiempo_extra': reporte(tiempo_extra, suma(tiempo_extra), (trabajado & (tiempo_extra > 0)).sum(axis=1))
+    }
+    for valores in datos.values():
+        valores['nombres'] = nombres
+    return datos
+
+def _columnas_dias(dias: int) -> List[int]:
+    """Posición (base 0) de la columna de cada día en la hoja"""
+    columnas, columna = [], 3
+    for dia in range(dias):
+        columnas.append(columna)
+        columna += 1 + _ESPACIOS_DIAS[dia % len(_ESPACIOS_DIAS)]
+    return columnas
+
+def escribir_libro(destino, tipo: str, datos: Dict[str, np.ndarray], inicio: datetime) -> None:
+    """Escribe un reporte con xlsxwriter en modo de memoria constante"""
+    empleados, dias = datos['celdas'].shape
+    columnas_dias = _columnas_dias(dias)
+    columna_total = columnas_dias[-1] + 3
+    columna_dias, columna_faltas, columna_horas = columna_total + 2, columna_total + 3, columna_total + 6
+
+    libro = xlsxwriter.Workbook(destino, {'constant_memory': True, 'in_memory': False})
+    hoja = libro.add_worksheet('RepQuincenal')
+    formato_fecha = libro.add_format({'num_format': 'dd/mm/yyyy'})
+
+    hoja.write_string(0, 0, f" Reporte Control Asistencia Quincenal - {TITULOS_ARCHIVO[tipo].title()}")
+    hoja.write_string(0, 30, 'Periodo: ')
+    hoja.write_string(0, 35, 'Primera Quincena')
+    hoja.write_datetime(0, 38, inicio, formato_fecha)
+    hoja.write_string(0, 41, '-')
+    hoja.write_datetime(0, 42, inicio + timedelta(days=dias - 1), formato_fecha)
+
+    hoja.write_string(2, 0, 'Nombre')
+    for dia, columna in enumerate(columnas_dias, start=1):
+        hoja.write_number(2, columna, float(dia))
+    hoja.write_string(2, columna_total, 'Tiempo\nTotal')
+    hoja.write_string(2, columna_dias, 'Días')
+    hoja.write_string(2, columna_faltas, 'Faltas')
+    hoja.write_string(2, columna_horas, 'Total de\nHoras')
+
+    ancho = columna_horas + 1
+    celdas = datos['celdas']
+    for fila in range(empleados):
+        valores: List = [None] * ancho
+        valores[0] = datos['nombres'][fila]
+        for columna, valor in zip(columnas_dias, celdas[fila]):
+            valores[columna] = valor
+        valores[columna_total] = datos['tiempo_total'][fila]
+        valores[columna_dias] = datos['dias'][fila]
+        valores[columna_faltas] = datos['faltas'][fila]
+        valores[columna_horas] = datos['total_horas'][fila]
+        hoja.write_row(3 + fila, 0, valores)
+
+    fila_pie = 3 + empleados + 5
+    hoja.write_string(fila_pie, 0, f"Página {max(1, empleados // 40 + 1)}")
+    hoja.write_string(fila_pie, 2, f" / {max(1, empleados // 40 + 1)}")
+    hoja.write_datetime(fila_pie, 31, inicio + timedelta(days=dias - 2, hours=9), formato_fecha)
+    libro.close()
+
+def generar_conjunto(empleados: int, dias: int = 15, semilla: int = 0) -> Dict[str, bytes]:
+    """Genera los 4 libros en memoria; devuelve sus bytes por tipo de reporte"""
+    inicio = datetime(2025, 6, 1)
+    libros = {}
+    for tipo, datos in generar_datos(empleados, dias, semilla).items():
+        buffer = io.BytesIO()
+        escribir_libro(buffer, tipo, datos, inicio)
+        libros[tipo] = buffer.getvalue()
+    return libros
+
+def escribir_conjunto(directorio: str, empleados: int, dias: int = 15, semilla: int = 0) -> Dict[str, str]:
+    """Escribe los 4 libros en `directorio` con los nombres que usa `datos/`"""
+    os.makedirs(directorio, exist_ok=True)
+    rutas = {}
+    for tipo, contenido in generar_conjunto(empleados, dias, semilla).items():
+        ruta = os.path.join(directorio, f"Reporte Quincenal de Asistencias - {TITULOS_ARCHIVO[tipo]}.xlsx")
+        with open(ruta, 'wb') as f:
+            f.write(contenido)
+        rutas[tipo] = ruta
+    return rutas
+
+def main(argumentos=None) -> None:
+    parser = argparse.ArgumentParser(description="Genera reportes quincenales sintéticos")
+    parser.add_argument('salida', help="Directorio donde se escriben los 4 archivos")
+    parser.add_argument('--empleados', type=int, default=1000)
+    parser.add_argument('--dias', type=int, default=15, help="Días del periodo (1 a 31)")
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args(argumentos)
+    if not 1 <= args.dias <= 31:
+        parser.error("--dias debe estar entre 1 y 31")
+    for ruta in escribir_conjunto(args.salida, args.empleados, args.dias, args.semilla).values():
+        print(ruta)
+
+if __name__ == '__main__':
+    main()
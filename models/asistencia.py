@@ -1,22 +1,72 @@
-from dataclasses import dataclass
-from typing import Optional
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Dict, Iterator, List, Optional, Union
+import numpy as np
+import pandas as pd
+
+class EstadoDia(IntEnum):
+    """Estado de una celda de día en los reportes quincenales"""
+    VACIO = 0
+    TRABAJADO = 1       # tiempo HH:MM válido
+    DESCANSO = 2        # N/L
+    FALTA = 3           # F
+    JUSTIFICADO = 4     # J
+    MAL_FORMADO = 5     # texto sin formato de tiempo
+    HORA_INVALIDA = 6   # contiene ':' pero no es HH:MM; cuenta como día trabajado
 
 @dataclass
 class DatosAsistencia:
+    """Fila del reporte. Las duraciones van en minutos (pd.NA si no hay dato);
+    solo conservan el texto original si su columna tenía celdas que no son tiempos."""
     nombre: str
-    horas_trabajadas: str
+    horas_trabajadas: Union[int, str, None]
     dias_trabajados: int
     dias_descanso: int
     faltas: int
     registro_mal: int
     retardos: int
-    diferencia_total: str
-    tiempo_extra: str
+    diferencia_total: Union[int, str, None]
+    tiempo_extra: Union[int, str, None]
 
 @dataclass
 class ReporteAsistencia:
-    empleados: list[DatosAsistencia]
+    """Reporte consolidado guardado en forma columnar.
+
+    `datos` tiene una columna por atributo de DatosAsistencia; los objetos por
+    empleado solo se construyen si se piden a través de `empleados`.
+    """
+    datos: pd.DataFrame
     total_dias_trabajados: int
     total_faltas: int
     total_retardos: int
-    total_registro_mal: int
\ No newline at end of file
+    total_registro_mal: int
+    # Nombres repetidos con datos distintos, por archivo de origen (sus filas se conservan todas)
+    nombres_duplicados: Dict[str, List[str]] = field(default_factory=dict)
+    # Huella de los archivos de origen; identifica el reporte en las cachés de exportación
+    huella: Optional[str] = None
+
+    @property
+    def total_empleados(self) -> int:
+        return len(self.datos)
+
+    @property
+    def empleados(self) -> List[DatosAsistencia]:
+        return list(self.iterar_empleados())
+
+    def iterar_empleados(self) -> Iterator[DatosAsistencia]:
+        for fila in self.datos.itertuples(index=False, name=None):
+            yield DatosAsistencia(*fila)
+
+@dataclass(frozen=True)
+class MatrizDias:
+    """Celdas de días de un reporte ya interpretadas (una fila por empleado)"""
+    columnas: list
+    estados: np.ndarray  # int8 con valores de EstadoDia
+    minutos: np.ndarray  # int32, 0 cuando la celda no es un tiempo válido
+
+@dataclass(frozen=True)
+class LibroAsistencia:
+    """Reporte de asistencia limpio junto con su matriz de días interpretada"""
+    datos: pd.DataFrame
+    dias: MatrizDias
+    huella: Optional[str] = None  # huella del contenido del archivo original
\ No newline at end of file
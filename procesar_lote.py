@@ -0,0 +1,226 @@
+"""Procesa por lotes muchos conjuntos de reportes quincenales sin Streamlit.
+
+Cada directorio que contiene los 4 archivos Excel (horas trabajadas,
+diferencia, retardos y tiempo extra, como en `datos/`) es un conjunto. Los
+conjuntos se procesan en un pool de procesos; por cada uno se escribe el
+reporte consolidado en el directorio de salida (respetando la estructura de
+la entrada) y al final un `resumen.json` con los tiempos por conjunto.
+
+El avance se registra en `avance.jsonl` a medida que termina cada conjunto,
+de modo que con --reanudar una ejecución interrumpida no repite los conjuntos
+ya terminados (siempre que sus archivos de entrada no hayan cambiado).
+
+Uso:
+    python procesar_lote.py ENTRADA SALIDA [--procesos N] [--formato xlsx|csv|parquet]
+                            [--reanudar] [--historial [DIRECTORIO]]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from services.archivos import ArchivosService
+from services.exportacion import FORMATOS_EXPORTACION, ExportacionService
+from services.reporte import ReporteService
+from utils.config import Config
+
+ARCHIVO_AVANCE = 'avance.jsonl'
+ARCHIVO_RESUMEN = 'resumen.json'
+TIPOS_REQUERIDOS = ['horas', 'diferencia', 'retardos', 'tiempo_extra']
+
+# Los reportes exportados por el checador no traen estilo por defecto; openpyxl
+# lo avisa en cada archivo (se define aquí para que aplique también en el pool)
+warnings.filterwarnings('ignore', message='Workbook contains no default style')
+
+def buscar_conjuntos(entrada: Path) -> Dict[str, Dict[str, str]]:
+    """Busca en el árbol los directorios con los 4 archivos; la clave es la ruta relativa"""
+    conjuntos = {}
+    for directorio, _, archivos in os.walk(entrada):
+        rutas = [os.path.join(directorio, nombre) for nombre in archivos]
+        try:
+            clasificados = ArchivosService.clasificar_archivos(rutas)
+        except ValueError as e:
+            print(f"[omitido] {directorio}: {e}", file=sys.stderr)
+            continue
+        if all(tipo in clasificados for tipo in TIPOS_REQUERIDOS):
+            relativo = Path(directorio).relative_to(entrada).as_posix()
+            conjuntos[relativo] = clasificados
+    return dict(sorted(conjuntos.items()))
+
+def firma_archivos(archivos: Dict[str, str]) -> Dict[str, List[int]]:
+    """Tamaño y fecha de modificación de cada archivo, para detectar cambios al reanudar"""
+    firma = {}
+    for tipo, ruta in archivos.items():
+        estado = os.stat(ruta)
+        firma[tipo] = [estado.st_size, estado.st_mtime_ns]
+    return firma
+
+def particion_historial(conjunto: str) -> Tuple[str, str]:
+    """Periodo (último directorio) y sede (los anteriores) de un conjunto `sede/.../periodo`"""
+    partes = conjunto.split('/')
+    return partes[-1], '-'.join(partes[:-1]) or 'general'
+
+def procesar_conjunto(
+    archivos: Dict[str, str],
+    destino: str,
+    formato: str,
+    historial: Optional[Tuple[str, str, str]] = None
+) -> Dict:
+    """Genera y escribe el reporte de un conjunto; se ejecuta en un proceso del pool.
+
+    `historial` es (directorio, periodo, sede) para guardar además el reporte
+    y sus matrices de días en el historial en Parquet.
+    """
+    inicio = time.perf_counter()
+    libros = {tipo: ArchivosService.cargar_libro_excel(archivos[tipo]) for tipo in TIPOS_REQUERIDOS}
+    fin_carga = time.perf_counter()
+
+    reporte = ReporteService().generar_reporte_consolidado(
+        libros['horas'], libros['diferencia'], libros['retardos'], libros['tiempo_extra']
+    )
+    fin_reporte = time.perf_counter()
+
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    temporal = os.path.join(os.path.dirname(destino), f".tmp-{os.path.basename(destino)}")
+    with open(temporal, 'wb') as f:
+        f.write(ExportacionService.exportar(reporte, formato))
+    os.replace(temporal, destino)
+    if historial is not None:
+        directorio, periodo, sede = historial
+        ReporteService.guardar_en_historial(reporte, periodo, sede, libros, directorio)
+    fin = time.perf_counter()
+
+    return {
+        'empleados': reporte.total_empleados,
+        'total_dias_trabajados': int(reporte.total_dias_trabajados),
+        'total_faltas': float(reporte.total_faltas),
+        'total_retardos': int(reporte.total_retardos),
+        'total_registro_mal': int(reporte.total_registro_mal),
+        'nombres_duplicados': reporte.nombres_duplicados,
+        'tiempos': {
+            'carga': round(fin_carga - inicio, 4),
+            'reporte': round(fin_reporte - fin_carga, 4),
+            'escritura': round(fin - fin_reporte, 4),
+            'total': round(fin - inicio, 4)
+        }
+    }
+
+def leer_avance(ruta: Path) -> Dict[str, Dict]:
+    """Lee los conjuntos ya terminados; ignora una última línea incompleta"""
+    avance = {}
+    if not ruta.exists():
+        return avance
+    with open(ruta, encoding='utf-8') as f:
+        for linea in f:
+            try:
+                registro = json.loads(linea)
+            except json.JSONDecodeError:
+                continue
+            avance[registro['conjunto']] = registro
+    return avance
+
+def ejecutar_lote(
+    entrada: Path,
+    salida: Path,
+    procesos: int,
+    formato: str,
+    reanudar: bool,
+    historial: Optional[str] = None
+) -> Dict:
+    """Procesa todos los conjuntos de `entrada` y devuelve el resumen de la ejecución"""
+    inicio = time.perf_counter()
+    salida.mkdir(parents=True, exist_ok=True)
+    ruta_avance = salida / ARCHIVO_AVANCE
+    if not reanudar and ruta_avance.exists():
+        ruta_avance.unlink()
+    avance = leer_avance(ruta_avance) if reanudar else {}
+
+    conjuntos = buscar_conjuntos(entrada)
+    resultados: Dict[str, Dict] = {}
+    pendientes = {}
+    for conjunto, archivos in conjuntos.items():
+        destino = salida / conjunto / f"reporte_asistencias.{formato}"
+        firma = firma_archivos(archivos)
+        previo = avance.get(conjunto)
+        if (previo and previo['estado'] == 'ok' and previo['firma'] == firma
+                and previo['salida'] == str(destino) and destino.exists()):
+            resultados[conjunto] = dict(previo, reanudado=True)
+        else:
+            pendientes[conjunto] = (archivos, destino, firma)
+
+    print(f"{len(conjuntos)} conjunto(s) encontrados; {len(pendientes)} por procesar", file=sys.stderr)
+
+    with open(ruta_avance, 'a', encoding='utf-8') as registro_avance, ProcessPoolExecutor(
+        max_workers=procesos, mp_context=multiprocessing.get_context('spawn')
+    ) as pool:
+        futuros = {
+            pool.submit(
+                procesar_conjunto, archivos, str(destino), formato,
+                (historial, *particion_historial(conjunto)) if historial else None
+            ): (conjunto, destino, firma)
+            for conjunto, (archivos, destino, firma) in pendientes.items()
+        }
+        for futuro in as_completed(futuros):
+            conjunto, destino, firma = futuros[futuro]
+            registro = {'conjunto': conjunto, 'firma': firma, 'salida': str(destino)}
+            try:
+                registro.update(estado='ok', **futuro.result())
+            except Exception as e:
+                registro.update(estado='error', error=str(e))
+            resultados[conjunto] = registro
+            registro_avance.write(json.dumps(registro, ensure_ascii=False) + '\n')
+            registro_avance.flush()
+            print(f"[{registro['estado']}] {conjunto}", file=sys.stderr)
+
+    resumen = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'entrada': str(entrada),
+        'procesos': procesos,
+        'formato': formato,
+        'conjuntos': len(conjuntos),
+        'procesados': len(pendientes),
+        'reanudados': len(conjuntos) - len(pendientes),
+        'errores': sum(1 for r in resultados.values() if r['estado'] != 'ok'),
+        'tiempo_total': round(time.perf_counter() - inicio, 4),
+        'resultados': dict(sorted(resultados.items()))
+    }
+    with open(salida / ARCHIVO_RESUMEN, 'w', encoding='utf-8') as f:
+        json.dump(resumen, f, ensure_ascii=False, indent=2)
+    return resumen
+
+def main(argumentos: Optional[List[str]] = None) -> int:
+    config = Config()
+    parser = argparse.ArgumentParser(description="Genera reportes consolidados de asistencia por lotes")
+    parser.add_argument('entrada', type=Path, help="Directorio con los conjuntos de 4 archivos Excel")
+    parser.add_argument('salida', type=Path, help="Directorio donde se escriben los reportes y el resumen")
+    parser.add_argument('--procesos', type=int, default=config.CARGA_PARALELA_PROCESOS,
+                        help="Procesos en paralelo (0 = número de CPUs)")
+    parser.add_argument('--formato', choices=list(FORMATOS_EXPORTACION), default='xlsx',
+                        help="Formato del reporte (parquet requiere pyarrow)")
+    parser.add_argument('--historial', nargs='?', const=config.HISTORIAL_DIR, metavar='DIRECTORIO',
+                        help="Guarda cada conjunto en el historial Parquet; la entrada debe ser sede/.../AAAA-MM-Q1")
+    parser.add_argument('--reanudar', action='store_true',
+                        help="Omite los conjuntos ya terminados según avance.jsonl")
+    args = parser.parse_args(argumentos)
+
+    if not args.entrada.is_dir():
+        parser.error(f"No existe el directorio de entrada: {args.entrada}")
+
+    resumen = ejecutar_lote(
+        args.entrada.resolve(), args.salida.resolve(),
+        args.procesos or os.cpu_count() or 1, args.formato, args.reanudar,
+        str(Path(args.historial).resolve()) if args.historial else None
+    )
+    print(f"{resumen['procesados']} procesados, {resumen['reanudados']} reanudados, "
+          f"{resumen['errores']} con error en {resumen['tiempo_total']:.2f} s")
+    return 1 if resumen['errores'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,18 +1,306 @@
+import os
+import json
+import logging
+import threading
+import importlib.util
+import multiprocessing
+import numpy as np
 import pandas as pd
-from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+from models.asistencia import LibroAsistencia, MatrizDias
+from utils.cache import CacheDisco, CacheLRU, huella_contenido
+from utils.config import Config
+from utils.excel import obtener_lector_excel
+from utils.instrumentacion import instrumentar, medir
 from utils.validacion import es_nombre_valido, limpiar_dataframe
+from .asistencia import AsistenciaService
+
+logger = logging.getLogger('asistencia.archivos')
+
+# Palabras del nombre de archivo que identifican cada reporte (en este orden,
+# porque "tiempo extra" y "horas trabajadas" comparten vocabulario)
+PALABRAS_TIPO_ARCHIVO = [
+    ('tiempo_extra', 'extra'),
+    ('diferencia', 'diferencia'),
+    ('retardos', 'retardo'),
+    ('horas', 'horas')
+]
+
+def _tamano_libro(libro: LibroAsistencia) -> int:
+    """Estima la memoria ocupada por un libro procesado"""
+    return (int(libro.datos.memory_usage(index=True, deep=True).sum())
+            + libro.dias.estados.nbytes + libro.dias.minutos.nbytes)
+
+_config = Config()
+_cache_libros = CacheLRU(
+    max_entradas=_config.CACHE_ARCHIVOS_MAX_ENTRADAS,
+    max_bytes=_config.CACHE_ARCHIVOS_MAX_MB * 1024 * 1024,
+    medir_tamano=_tamano_libro
+)
+
+# Copia en disco (Arrow IPC) de los libros ya parseados; sobrevive a reinicios y
+# se comparte entre sesiones y procesos. Cambiar la versión invalida lo guardado.
+_VERSION_CACHE_DISCO = 2
+_cache_disco = CacheDisco(
+    directorio=_config.CACHE_DISCO_DIR,
+    max_bytes=_config.CACHE_DISCO_MAX_MB * 1024 * 1024,
+    extension=f".v{_VERSION_CACHE_DISCO}.arrow"
+) if importlib.util.find_spec('pyarrow') is not None else None
+
+_pool_procesos: Optional[ProcessPoolExecutor] = None
+_lock_pool = threading.Lock()
+
+def _obtener_pool() -> ProcessPoolExecutor:
+    """Crea (una sola vez) el pool de procesos para parsear archivos Excel.
+
+    Se usa 'spawn' porque Streamlit atiende sesiones en hilos y hacer fork de
+    un proceso con hilos puede dejar locks tomados en los hijos.
+    """
+    global _pool_procesos
+    with _lock_pool:
+        if _pool_procesos is None:
+            _pool_procesos = ProcessPoolExecutor(
+                max_workers=_config.CARGA_PARALELA_PROCESOS or os.cpu_count(),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _pool_procesos
+
+def _descartar_pool() -> None:
+    """Descarta el pool tras un fallo para crearlo de nuevo en la siguiente carga"""
+    global _pool_procesos
+    with _lock_pool:
+        if _pool_procesos is not None:
+            _pool_procesos.shutdown(wait=False, cancel_futures=True)
+            _pool_procesos = None
+
+def _leer_libro(contenido: bytes, hoja: Union[int, str], huella: str, lector: Callable) -> LibroAsistencia:
+    """Parsea y limpia una hoja de Excel; se ejecuta también en procesos del pool"""
+    with medir('excel.leer_hoja', bytes=len(contenido)) as medicion:
+        df = lector(contenido, hoja)
+        if medicion:
+            medicion.filas = len(df)
+    df = limpiar_dataframe(df)
+    return LibroAsistencia(datos=df, dias=AsistenciaService.parsear_dias(df), huella=huella)
+
+def _escribir_libro_arrow(libro: LibroAsistencia, ruta: str) -> None:
+    """Guarda el DataFrame limpio y la matriz de días en un archivo Arrow IPC sin comprimir.
+
+    Las columnas se guardan por posición y sus etiquetas originales (texto o
+    número de día) van en los metadatos, igual que las columnas de días.
+    """
+    import pyarrow as pa
+    df = libro.datos
+    columnas = {f"c{i}": df.iloc[:, i] for i in range(df.shape[1])}
+    for j in range(libro.dias.estados.shape[1]):
+        columnas[f"e{j}"] = libro.dias.estados[:, j]
+        columnas[f"m{j}"] = libro.dias.minutos[:, j]
+    tabla = pa.Table.from_pandas(pd.DataFrame(columnas, index=df.index), preserve_index=False)
+    metadatos = dict(tabla.schema.metadata or {})
+    metadatos[b'asistencia'] = json.dumps({
+        'columnas': list(df.columns),
+        'dias': list(libro.dias.columnas)
+    }).encode()
+    tabla = tabla.replace_schema_metadata(metadatos)
+    with pa.OSFile(ruta, 'wb') as destino, pa.ipc.new_file(destino, tabla.schema) as escritor:
+        escritor.write_table(tabla)
+
+def _leer_libro_arrow(ruta: str, huella: str) -> LibroAsistencia:
+    """Lee un libro guardado por _escribir_libro_arrow usando memoria mapeada"""
+    import pyarrow as pa
+    with pa.memory_map(ruta) as origen:
+        tabla = pa.ipc.open_file(origen).read_all()
+    metadatos = json.loads(tabla.schema.metadata[b'asistencia'])
+    columnas, dias = metadatos['columnas'], metadatos['dias']
+    df = tabla.select([f"c{i}" for i in range(len(columnas))]).to_pandas()
+    df.columns = columnas
+    estados = np.column_stack([tabla.column(f"e{j}").to_numpy() for j in range(len(dias))]) if dias else np.empty((len(df), 0))
+    minutos = np.column_stack([tabla.column(f"m{j}").to_numpy() for j in range(len(dias))]) if dias else np.empty((len(df), 0))
+    return LibroAsistencia(
+        datos=df,
+        dias=MatrizDias(columnas=dias, estados=estados.astype(np.int8), minutos=minutos.astype(np.int32)),
+        huella=huella
+    )
 
 class ArchivosService:
     @staticmethod
     def cargar_archivo_excel(archivo) -> Optional[pd.DataFrame]:
         """Carga y limpia un archivo Excel de asistencia"""
+        return ArchivosService.cargar_libro_excel(archivo).datos
+
+    @staticmethod
+    @instrumentar('archivos.cargar_libro_excel')
+    def cargar_libro_excel(archivo, hoja: Union[int, str] = 0) -> LibroAsistencia:
+        """Carga un archivo Excel e interpreta sus celdas de días una sola vez.
+
+        El resultado se guarda en caché por huella del contenido, de modo que
+        volver a cargar los mismos bytes (p. ej. en cada rerun de Streamlit)
+        no repite el parseo. El libro devuelto es compartido: no modificarlo.
+        """
         try:
-            df = pd.read_excel(archivo, sheet_name=0, header=2)
-            df = limpiar_dataframe(df)
-            return df
+            contenido = ArchivosService.leer_contenido(archivo)
+            huella = ArchivosService._huella_hoja(contenido, hoja)
+            libro = _cache_libros.obtener(huella)
+            if libro is None:
+                libro = ArchivosService._leer_de_disco(huella)
+                if libro is None:
+                    libro = _leer_libro(contenido, hoja, huella, obtener_lector_excel(_config.MOTOR_EXCEL))
+                    ArchivosService._guardar_en_disco(libro)
+                _cache_libros.guardar(huella, libro)
+            return libro
         except Exception as e:
             raise ValueError(f"Error al cargar archivo: {str(e)}")
 
+    @staticmethod
+    @instrumentar('archivos.cargar_libros_paralelo', filas=lambda resultado: sum(len(libro.datos) for libro in resultado[0].values()))
+    def cargar_libros_paralelo(
+        archivos: Dict[str, Any]
+    ) -> Tuple[Dict[str, LibroAsistencia], Dict[str, str]]:
+        """Carga varios archivos (u hojas) a la vez usando un pool de procesos.
+
+        Cada valor puede ser un archivo o una tupla (archivo, hoja). Devuelve los
+        libros cargados y los errores, ambos por clave. Los archivos ya presentes
+        en caché no se vuelven a parsear, y si el total por parsear es pequeño se
+        hace en serie para no pagar el costo de enviar datos a otro proceso.
+        """
+        libros: Dict[str, LibroAsistencia] = {}
+        errores: Dict[str, str] = {}
+        pendientes: Dict[str, Tuple[bytes, Union[int, str], str, Callable]] = {}
+        lector = obtener_lector_excel(_config.MOTOR_EXCEL)
+
+        for clave, entrada in archivos.items():
+            archivo, hoja = entrada if isinstance(entrada, tuple) else (entrada, 0)
+            try:
+                contenido = ArchivosService.leer_contenido(archivo)
+            except Exception as e:
+                errores[clave] = f"Error al cargar archivo: {str(e)}"
+                continue
+            huella = ArchivosService._huella_hoja(contenido, hoja)
+            libro = _cache_libros.obtener(huella)
+            if libro is None:
+                libro = ArchivosService._leer_de_disco(huella)
+                if libro is not None:
+                    _cache_libros.guardar(huella, libro)
+            if libro is not None:
+                libros[clave] = libro
+            else:
+                pendientes[clave] = (contenido, hoja, huella, lector)
+
+        total_bytes = sum(len(args[0]) for args in pendientes.values())
+        en_serie = (
+            len(pendientes) < 2
+            or total_bytes < _config.CARGA_PARALELA_MIN_KB * 1024
+            or (_config.CARGA_PARALELA_PROCESOS or os.cpu_count() or 1) < 2
+        )
+
+        if en_serie:
+            resultados = {
+                clave: ArchivosService._ejecutar_lectura(_leer_libro, *args)
+                for clave, args in pendientes.items()
+            }
+        else:
+            try:
+                pool = _obtener_pool()
+                futuros = {clave: pool.submit(_leer_libro, *args) for clave, args in pendientes.items()}
+                resultados = {
+                    clave: ArchivosService._ejecutar_lectura(futuro.result)
+                    for clave, futuro in futuros.items()
+                }
+            except BrokenProcessPool:
+                _descartar_pool()
+                resultados = {
+                    clave: ArchivosService._ejecutar_lectura(_leer_libro, *args)
+                    for clave, args in pendientes.items()
+                }
+
+        for clave, (libro, error) in resultados.items():
+            if error is not None:
+                errores[clave] = error
+            else:
+                _cache_libros.guardar(libro.huella, libro)
+                ArchivosService._guardar_en_disco(libro)
+                libros[clave] = libro
+
+        return libros, errores
+
+    @staticmethod
+    def _ejecutar_lectura(funcion, *args) -> Tuple[Optional[LibroAsistencia], Optional[str]]:
+        """Ejecuta una lectura y convierte su excepción en mensaje de error"""
+        try:
+            return funcion(*args), None
+        except BrokenProcessPool:
+            raise
+        except Exception as e:
+            return None, f"Error al cargar archivo: {str(e)}"
+
+    @staticmethod
+    def _leer_de_disco(huella: str) -> Optional[LibroAsistencia]:
+        """Busca el libro en la caché en disco; None si no está o no hay pyarrow"""
+        if _cache_disco is None:
+            return None
+        return _cache_disco.obtener(huella, lambda ruta: _leer_libro_arrow(ruta, huella))
+
+    @staticmethod
+    def _guardar_en_disco(libro: LibroAsistencia) -> None:
+        """Guarda el libro en la caché en disco; si no se puede (p. ej. columnas con
+        tipos mezclados que Arrow no admite, o disco lleno) se registra y no se guarda"""
+        if _cache_disco is None:
+            return
+        import pyarrow as pa
+        try:
+            _cache_disco.guardar(libro.huella, lambda ruta: _escribir_libro_arrow(libro, ruta))
+        except (pa.ArrowException, TypeError, OSError) as e:
+            logger.warning("No se guardó el archivo %s en la caché en disco: %s", libro.huella, e)
+
+    @staticmethod
+    def _huella_hoja(contenido: bytes, hoja: Union[int, str]) -> str:
+        """Huella del contenido, distinguiendo hojas distintas del mismo archivo"""
+        huella = huella_contenido(contenido)
+        return huella if hoja == 0 else f"{huella}:{hoja}"
+
+    @staticmethod
+    def leer_contenido(archivo) -> bytes:
+        """Obtiene los bytes de una ruta, un archivo subido o un objeto tipo archivo"""
+        if isinstance(archivo, (bytes, bytearray)):
+            return bytes(archivo)
+        if isinstance(archivo, (str, os.PathLike)):
+            with open(archivo, 'rb') as f:
+                return f.read()
+        if hasattr(archivo, 'getvalue'):
+            return archivo.getvalue()
+        posicion = archivo.tell()
+        contenido = archivo.read()
+        archivo.seek(posicion)
+        return contenido
+
+    @staticmethod
+    def clasificar_archivos(rutas) -> Dict[str, str]:
+        """Asigna cada archivo Excel a su tipo de reporte según su nombre.
+
+        Devuelve un diccionario con las claves 'horas', 'diferencia', 'retardos'
+        y 'tiempo_extra' (solo las encontradas). Un tipo repetido produce ValueError.
+        """
+        clasificados: Dict[str, str] = {}
+        for ruta in sorted(str(r) for r in rutas):
+            nombre = os.path.basename(ruta).lower()
+            if not nombre.endswith(('.xlsx', '.xls')) or nombre.startswith('~$'):
+                continue
+            for tipo, palabra in PALABRAS_TIPO_ARCHIVO:
+                if palabra in nombre:
+                    if tipo in clasificados:
+                        raise ValueError(f"Hay más de un archivo de '{tipo}': {clasificados[tipo]}, {ruta}")
+                    clasificados[tipo] = ruta
+                    break
+        return clasificados
+
+    @staticmethod
+    def limpiar_cache(disco: bool = False) -> None:
+        """Vacía la caché de archivos procesados (y la de disco si se pide)"""
+        _cache_libros.limpiar()
+        if disco and _cache_disco is not None:
+            _cache_disco.limpiar()
+
     @staticmethod
     def validar_archivos_cargados(*archivos) -> bool:
         """Verifica que todos los archivos requeridos estén cargados"""
@@ -1,7 +1,15 @@
+import numpy as np
 import pandas as pd
 from typing import List, Dict
-from utils.tiempo import tiempo_a_minutos
-from models.asistencia import DatosAsistencia, ReporteAsistencia
+from utils.tiempo import tiempo_a_minutos, serie_a_minutos
+from utils.instrumentacion import instrumentar
+from models.asistencia import DatosAsistencia, ReporteAsistencia, EstadoDia, MatrizDias
+
+_ESTADOS_POR_CODIGO = {
+    'F': EstadoDia.FALTA,
+    'N/L': EstadoDia.DESCANSO,
+    'J': EstadoDia.JUSTIFICADO
+}
 
 class AsistenciaService:
     @staticmethod
@@ -36,4 +44,50 @@ class AsistenciaService:
                   if str(col).isdigit() 
                   and pd.notna(fila[col]) 
                   and fila[col] not in ['F', 'N/L', 'J'] 
-                  and tiempo_a_minutos(fila[col]) >= 10)
\ No newline at end of file
+                  and tiempo_a_minutos(fila[col]) >= 10)
+
+    @staticmethod
+    def obtener_columnas_dias(df: pd.DataFrame) -> List:
+        """Obtiene las columnas de días (nombres numéricos) del DataFrame"""
+        return [col for col in df.columns if str(col).isdigit()]
+
+    @staticmethod
+    @instrumentar('asistencia.parsear_dias', filas=lambda dias: len(dias.estados))
+    def parsear_dias(df: pd.DataFrame) -> MatrizDias:
+        """Interpreta una sola vez las celdas de días como estados y minutos"""
+        columnas = AsistenciaService.obtener_columnas_dias(df)
+        forma = (len(df), len(columnas))
+        celdas = pd.Series(df[columnas].to_numpy(dtype=object).ravel(), dtype=object)
+        texto = celdas.astype(str)
+
+        estados = np.full(len(celdas), EstadoDia.MAL_FORMADO, dtype=np.int8)
+        estados[texto.str.contains(':', regex=False).to_numpy()] = EstadoDia.HORA_INVALIDA
+
+        minutos, validos = serie_a_minutos(texto)
+        estados[validos] = EstadoDia.TRABAJADO
+
+        for codigo, estado in _ESTADOS_POR_CODIGO.items():
+            estados[(celdas == codigo).to_numpy()] = estado
+        estados[(celdas.isna() | (texto.str.strip() == '')).to_numpy()] = EstadoDia.VACIO
+
+        return MatrizDias(
+            columnas=columnas,
+            estados=estados.reshape(forma),
+            minutos=minutos.astype(np.int32).reshape(forma)
+        )
+
+    @staticmethod
+    def contar_dias(dias: MatrizDias) -> pd.DataFrame:
+        """Calcula los conteos de días de todas las filas a partir de la matriz.
+
+        Equivale a aplicar contar_dias_trabajados, contar_dias_descanso,
+        contar_registro_mal y contar_retardos fila por fila.
+        """
+        estados, minutos = dias.estados, dias.minutos
+        con_tiempo = estados == EstadoDia.TRABAJADO
+        return pd.DataFrame({
+            'Días Trabajados': (con_tiempo | (estados == EstadoDia.HORA_INVALIDA)).sum(axis=1),
+            'Días Descanso': (estados == EstadoDia.DESCANSO).sum(axis=1),
+            'Registro Mal': (con_tiempo & (minutos <= -120)).sum(axis=1),
+            'Retardos': (con_tiempo & (minutos >= 10)).sum(axis=1)
+        })
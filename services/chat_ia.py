@@ -1,85 +1,54 @@
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
 import requests
-from typing import Dict, Optional, Tuple, Any
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Any, Union
 import pandas as pd
 import numpy as np
-from io import StringIO
-import sys
+from utils.cache import CacheDisco, CacheLRU, huella_dataframe
 from utils.config import Config
+from utils.instrumentacion import instrumentar
+from utils.tiempo import tiempo_a_minutos, serie_a_minutos, minutos_a_tiempo
+from .ejecucion import obtener_ejecutor
 
+# Código generado por pregunta normalizada y prompt completo (que incluye el esquema y la muestra del reporte)
+_config = Config()
+_cache_respuestas = CacheLRU(
+    max_entradas=_config.CACHE_IA_MAX_ENTRADAS,
+    ttl_segundos=_config.CACHE_IA_TTL_HORAS * 3600 or None
+)
+_cache_respuestas_disco = (
+    CacheDisco(_config.CACHE_IA_DIR, _config.CACHE_IA_MAX_MB * 1024 * 1024, '.json')
+    if _config.CACHE_IA_DISCO else None
+)
 
-class ChatIAService:
-    def __init__(self, api_key: str = None):
-        self.config = Config()
-        # Usar la API key proporcionada o la del config
-        self.api_key = api_key or self.config.GROQ_API_KEY
-        self.api_url = "https://api.groq.com/openai/v1/chat/completions"
-    
-    def set_api_key(self, api_key: str):
-        """Método para establecer la API key después de la inicialización"""
-        self.api_key = api_key
-    
-    def generar_consulta_ia(
-        self, 
-        pregunta: str, 
-        df_reporte: pd.DataFrame
-    ) -> Tuple[Optional[str], Optional[pd.DataFrame], Optional[str]]:
-        """Genera y ejecuta una consulta de IA sobre el DataFrame"""
-        if not self.api_key or self.api_key == "tu_api_key_aqui":
-            return "API Key no configurada", None, None
-            
-        codigo = self._generar_codigo_ia(pregunta, df_reporte)
-        if isinstance(codigo, tuple):  # Si hay error
-            return codigo[0], None, None
-            
-        resultado_texto, resultado_df = self._ejecutar_codigo(codigo, df_reporte)
-        return resultado_texto, resultado_df, codigo
-    
-    def _generar_codigo_ia(self, pregunta: str, df_reporte: pd.DataFrame) -> str:
-        """Genera código Python para responder la pregunta usando IA"""
-        url = self.api_url
-        
-        # Obtener información del DataFrame
-        info_str, dtypes_detail = self._obtener_info_dataframe(df_reporte)
-        
-        # Obtener describe solo para columnas numéricas
-        describe_str = ""
-        try:
-            numeric_cols = df_reporte.select_dtypes(include=['int64', 'float64']).columns.tolist()
-            if numeric_cols:
-                describe_str = str(df_reporte[numeric_cols].describe())
-        except:
-            describe_str = "No hay columnas numéricas para describir"
-        
-        contexto = f"""
+# Prompt del sistema; {datos} se sustituye por el resumen del reporte
+_PLANTILLA_CONTEXTO = """
 Eres un experto en pandas y análisis de datos de RH. Genera SOLO código Python ejecutable para responder preguntas sobre el DataFrame 'df_reporte'.
 
-INFORMACIÓN DEL DATAFRAME:
-Filas: {len(df_reporte)}
-Columnas: {list(df_reporte.columns)}
-
-TIPOS DE DATOS:
-{df_reporte.dtypes.to_string()}
-
-MUESTRA DE DATOS:
-{df_reporte.head(2).to_string()}
-
-ESTADÍSTICAS (solo columnas numéricas):
-{describe_str}
+{datos}
 
 FUNCIONES AUXILIARES DISPONIBLES:
-1. convertir_tiempo_a_minutos(tiempo_str) - Convierte "HH:MM" a minutos
-2. convertir_tiempo_a_horas_decimales(tiempo_str) - Convierte "HH:MM" a horas decimales
+1. convertir_tiempo_a_minutos(tiempo_str) - Convierte "HH:MM" o "-HH:MM" a minutos
+2. convertir_tiempo_a_horas_decimales(tiempo_str) - Convierte "HH:MM" o minutos a horas decimales
 3. obtener_empleado_max_tiempo_extra() - Obtiene empleado con más tiempo extra
 4. obtener_empleado_max_horas_trabajadas() - Obtiene empleado con más horas trabajadas
 5. obtener_top_empleados_por_columna(columna, n=5, orden='desc') - Top N empleados por columna
+6. formatear_minutos(serie) - Da formato "HH:MM" a una columna de minutos para mostrarla
 
 REGLAS IMPORTANTES:
 1. USA SOLO el DataFrame 'df_reporte'
 2. SIEMPRE termina con print() del resultado
 3. SIEMPRE verifica que las columnas existan antes de usarlas
-4. Para columnas de tiempo (formato HH:MM), usa las funciones auxiliares
+4. Las columnas horas_trabajadas, diferencia_total y tiempo_extra son MINUTOS enteros (pueden tener nulos); opera con ellas directamente
 5. Para rankings, usa .head(5) o .tail(5)
 6. Para preguntas sobre tiempo extra o horas trabajadas, usa las funciones auxiliares
+7. Para mostrar duraciones como HH:MM, usa formatear_minutos()
 
 EJEMPLOS DE CÓDIGO CORRECTO:
 
@@ -91,31 +60,159 @@ print(resultado)
 
 Para retardos:
 ```python
-if 'Retardos' in df_reporte.columns:
+if 'retardos' in df_reporte.columns:
     print("Top 5 empleados con más retardos:")
-    print(df_reporte.nlargest(5, 'Retardos')[['Nombre', 'Retardos']])
+    print(df_reporte.nlargest(5, 'retardos')[['nombre', 'retardos']])
 else:
-    print("La columna 'Retardos' no existe")
+    print("La columna 'retardos' no existe")
 ```
 
 Para horas trabajadas:
 ```python
-if 'Horas Trabajadas' in df_reporte.columns:
-    # Crear columna temporal con minutos
-    df_temp = df_reporte.copy()
-    df_temp['Horas_Minutos'] = df_temp['Horas Trabajadas'].apply(convertir_tiempo_a_minutos)
-    
+if 'horas_trabajadas' in df_reporte.columns:
     print("Top 5 empleados con más horas trabajadas:")
-    top_horas = df_temp.nlargest(5, 'Horas_Minutos')[['Nombre', 'Horas Trabajadas']]
+    top_horas = df_reporte.nlargest(5, 'horas_trabajadas')[['nombre', 'horas_trabajadas']]
+    top_horas = top_horas.assign(horas_trabajadas=formatear_minutos(top_horas['horas_trabajadas']))
     print(top_horas)
 else:
-    print("La columna 'Horas Trabajadas' no existe")
+    print("La columna 'horas_trabajadas' no existe")
 ```
 
-IMPORTANTE: Para columnas con formato de tiempo (HH:MM), SIEMPRE usa las funciones auxiliares para convertir antes de hacer comparaciones o cálculos.
+IMPORTANTE: Las columnas de duración ya están en minutos; compáralas y súmalas directamente y usa formatear_minutos() solo para mostrar el resultado.
 
 GENERA SOLO CÓDIGO PYTHON, SIN EXPLICACIONES.
 """
+
+# Resumen del reporte para el prompt, por huella del reporte (se calcula una vez por reporte)
+_cache_contextos = CacheLRU(max_entradas=_config.CACHE_IA_CONTEXTOS_MAX_ENTRADAS)
+
+# Sesión HTTP compartida por todas las instancias: reutiliza conexiones (keep-alive)
+_sesion: Optional[requests.Session] = None
+_sesion_lock = threading.Lock()
+
+def _obtener_sesion() -> requests.Session:
+    """Crea la sesión la primera vez, con pool de conexiones y reintentos en 429/5xx"""
+    global _sesion
+    with _sesion_lock:
+        if _sesion is None:
+            # Un error de lectura puede llegar con la petición ya procesada (POST no
+            # idempotente): solo se reintentan fallos de conexión y las respuestas 429/5xx
+            reintentos = Retry(
+                total=_config.IA_REINTENTOS,
+                read=0,
+                backoff_factor=_config.IA_REINTENTOS_ESPERA,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset({'POST'}),
+                respect_retry_after_header=True,
+                raise_on_status=False
+            )
+            adaptador = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=_config.IA_CONEXIONES_MAX,
+                max_retries=reintentos
+            )
+            sesion = requests.Session()
+            sesion.mount('https://', adaptador)
+            sesion.mount('http://', adaptador)
+            _sesion = sesion
+        return _sesion
+
+# Preguntas frecuentes que se responden sin llamar al modelo. Los patrones se
+# aplican sobre la pregunta en minúsculas y sin acentos; el orden importa
+# ('horas extra' debe reconocerse antes que 'horas').
+_METRICAS_LOCALES = [
+    (re.compile(r'tiempo extra|horas? extras?'), 'tiempo_extra'),
+    (re.compile(r'horas? trabajadas?|\bhoras\b'), 'horas_trabajadas'),
+    (re.compile(r'retardos?|llegadas? tarde|impuntual\w*'), 'retardos'),
+    (re.compile(r'faltas?|ausencias?|inasistencias?'), 'faltas'),
+    (re.compile(r'dias? trabajados?'), 'dias_trabajados'),
+    (re.compile(r'dias? de descanso|descansos?'), 'dias_descanso'),
+    (re.compile(r'registros? mal\w*|mal registr\w*|registros? incorrectos?'), 'registro_mal'),
+    (re.compile(r'diferencias?'), 'diferencia_total')
+]
+_PATRON_PROMEDIO = re.compile(r'\b(promedio|media)\b')
+_PATRON_TOTAL = re.compile(r'\b(total|suma)\b')
+_PATRON_MAS = re.compile(r'\b(mas|mayor|maximo)\b')
+_PATRON_MENOS = re.compile(r'\b(menos|menor|minimo)\b')
+_PATRON_TOP = re.compile(r'\btop\s*(\d+)?|\branking\b|\b(?:los|las|primeros|primeras)\s+(\d+)\b')
+_PATRON_PLURAL = re.compile(r'\b(quienes|empleados|personas|trabajadores|colaboradores)\b')
+# Preguntas abiertas que siempre van al modelo
+_PATRON_ABIERTA = re.compile(
+    r'\b(por ?que|patron\w*|recomi\w*|analisis|analiza\w*|compar\w*|tendencia\w*|explica\w*|'
+    r'resumen|resume|accion\w*|productividad|grafic\w*)\b'
+)
+# Umbrales, conteos y filtros (por persona, periodo, área...): la respuesta
+# local daría el resultado global, así que van al modelo. Se aplican con las
+# métricas ya sustituidas por '_'.
+_PATRON_FILTRO = re.compile(
+    r'\b(?:mas|menos|mayor(?:es)?|menor(?:es)?|superior(?:es)?|inferior(?:es)?)\s+(?:de|que|a|o igual)\b|'
+    r'\b(?:al|por lo) menos\b|\b(?:arriba|debajo|encima) de\b|\b(?:entre|sin|ningun[oa]?|cuant[oa]s?)\b|'
+    r'\b_\s+(?:de|del|para)\s+(?!(?:los|las|todos|todas|cada)\b|(?:empleados|personas|trabajadores|colaboradores|personal|plantilla)\b)\w|'
+    r'\bpor\s+(?!(?:empleado|persona|trabajador|colaborador)\b)\w'
+)
+# Palabras de los nombres de empleados que no bastan para reconocer un nombre
+_PALABRAS_NO_NOMBRE = {'del', 'las', 'los', 'san', 'santa', 'mas', 'top'}
+_MAX_PALABRAS_LOCALES = 16
+
+def _sin_acentos(texto: str) -> str:
+    texto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+# Filas con que se escriben en el texto las tablas impresas que no son el resultado final
+TABLA_EN_TEXTO_MAX_FILAS = 20
+
+class ChatIAService:
+    def __init__(self, api_key: str = None):
+        self.config = Config()
+        # Usar la API key proporcionada o la del config
+        self.api_key = api_key or self.config.GROQ_API_KEY
+        self.api_url = self.config.IA_API_URL
+    
+    def set_api_key(self, api_key: str):
+        """Método para establecer la API key después de la inicialización"""
+        self.api_key = api_key
+    
+    def generar_consulta_ia(
+        self, 
+        pregunta: str, 
+        df_reporte: pd.DataFrame,
+        al_recibir: Optional[Callable[[str], None]] = None,
+        huella: Optional[str] = None
+    ) -> Tuple[Optional[str], Optional[pd.DataFrame], Optional[str]]:
+        """Genera y ejecuta una consulta de IA sobre el DataFrame.
+
+        Si se pasa `al_recibir`, la respuesta se pide en streaming y la función se
+        llama con el código parcial cada vez que llega un fragmento. `huella`
+        identifica el reporte (ReporteAsistencia.huella) para no recalcularla.
+        """
+        if self.config.IA_RESPUESTAS_LOCALES:
+            respuesta = self._responder_localmente(pregunta, df_reporte)
+            if respuesta is not None:
+                if al_recibir is not None:
+                    al_recibir(respuesta[2])
+                return respuesta
+
+        if not self.api_key or self.api_key == "tu_api_key_aqui":
+            return "API Key no configurada", None, None
+            
+        codigo = self._generar_codigo_ia(pregunta, df_reporte, al_recibir, huella)
+        if isinstance(codigo, tuple):  # Si hay error
+            return codigo[0], None, None
+            
+        resultado_texto, resultado_df = self._ejecutar_codigo_aislado(codigo, df_reporte, huella)
+        return resultado_texto, resultado_df, codigo
+    
+    @instrumentar('chat_ia.generar_codigo')
+    def _generar_codigo_ia(
+        self,
+        pregunta: str,
+        df_reporte: pd.DataFrame,
+        al_recibir: Optional[Callable[[str], None]] = None,
+        huella: Optional[str] = None
+    ) -> str:
+        """Genera código Python para responder la pregunta usando IA"""
+        url = self.api_url
+        contexto = self._obtener_contexto(df_reporte, huella)
         
         headers = {
             "Content-Type": "application/json", 
@@ -133,23 +230,343 @@ GENERA SOLO CÓDIGO PYTHON, SIN EXPLICACIONES.
             "top_p": 1,
             "stream": False
         }
+
+        clave = self._clave_respuesta(pregunta, data)
+        codigo = self._buscar_respuesta(clave)
+        if codigo is not None:
+            if al_recibir is not None:
+                al_recibir(codigo)
+            return codigo
         
+        timeout = (self.config.IA_TIMEOUT_CONEXION, self.config.IA_TIMEOUT_LECTURA)
         try:
-            response = requests.post(url, headers=headers, json=data, timeout=30)
-            response.raise_for_status()
-            codigo = response.json()['choices'][0]['message']['content']
-            # Limpiar el código de markdown si existe
-            codigo = codigo.replace('```python', '').replace('```', '').strip()
+            if al_recibir is not None and self.config.IA_STREAMING:
+                with _obtener_sesion().post(
+                    url, headers=headers, json={**data, "stream": True}, timeout=timeout, stream=True
+                ) as response:
+                    response.raise_for_status()
+                    codigo, completa = self._leer_stream(response, al_recibir)
+            else:
+                response = _obtener_sesion().post(url, headers=headers, json=data, timeout=timeout)
+                response.raise_for_status()
+                eleccion = response.json()['choices'][0]
+                codigo = self._limpiar_codigo(eleccion['message']['content'])
+                completa = eleccion.get('finish_reason') != 'length'
+                if al_recibir is not None:
+                    al_recibir(codigo)
+            # Una respuesta cortada (max_tokens o conexión cerrada) no se reutiliza
+            if completa:
+                self._guardar_respuesta(clave, codigo)
             return codigo
         except Exception as e:
             return f"Error al generar consulta: {str(e)}"
 
+    @staticmethod
+    def _obtener_contexto(df_reporte: pd.DataFrame, huella: Optional[str] = None) -> str:
+        """Prompt del sistema para el reporte; el resumen de datos se calcula una vez por huella"""
+        clave = huella or huella_dataframe(df_reporte)
+        contexto = _cache_contextos.obtener(clave)
+        if contexto is None:
+            contexto = _PLANTILLA_CONTEXTO.replace('{datos}', ChatIAService._resumir_datos(df_reporte))
+            _cache_contextos.guardar(clave, contexto)
+        return contexto
+
+    @staticmethod
+    def _resumir_datos(df: pd.DataFrame) -> str:
+        """Esquema, estadísticas y muestra del reporte en un tamaño acotado.
+
+        Se describen como máximo IA_CONTEXTO_MAX_COLUMNAS columnas con una línea
+        cada una y dos filas de muestra, y el texto se recorta a
+        IA_CONTEXTO_MAX_CARACTERES, así que no crece con el número de empleados.
+        """
+        columnas = list(df.columns[:_config.IA_CONTEXTO_MAX_COLUMNAS])
+        vista = df[columnas]
+        numericas = vista.select_dtypes(include='number')
+        estadisticas = numericas.agg(['min', 'mean', 'max']) if not numericas.empty else pd.DataFrame()
+        nulos = vista.isna().sum()
+
+        lineas = [f"INFORMACIÓN DEL DATAFRAME:\nFilas: {len(df)}\n", "COLUMNAS (tipo y estadísticas):"]
+        for columna in columnas:
+            serie = vista[columna]
+            if columna in estadisticas.columns:
+                minimo, media, maximo = (ChatIAService._valor_prompt(v) for v in estadisticas[columna])
+                detalle = f"min {minimo}, media {media}, max {maximo}"
+            elif isinstance(serie.dtype, pd.CategoricalDtype):
+                detalle = f"{len(serie.cat.categories)} valores distintos"
+            else:
+                detalle = "texto"
+            lineas.append(f"- {columna} ({serie.dtype}): {detalle}, nulos {nulos[columna]}")
+        if len(df.columns) > len(columnas):
+            lineas.append(f"- ... y {len(df.columns) - len(columnas)} columnas más")
+
+        # Series.map por columna: DataFrame.map solo existe desde pandas 2.1
+        muestra = vista.head(2).astype(object).apply(
+            lambda columna: columna.map(lambda v: v[:30] if isinstance(v, str) else v)
+        )
+        lineas += ["", "MUESTRA DE DATOS:", muestra.to_string()]
+
+        resumen = "\n".join(lineas)
+        limite = _config.IA_CONTEXTO_MAX_CARACTERES
+        if len(resumen) > limite:
+            resumen = resumen[:limite].rsplit("\n", 1)[0] + "\n(resumen recortado)"
+        return resumen
+
+    @staticmethod
+    def _valor_prompt(valor) -> str:
+        """Valor numérico corto para el prompt (enteros sin decimales, NA para nulos)"""
+        if pd.isna(valor):
+            return "NA"
+        valor = float(valor)
+        return str(int(valor)) if valor.is_integer() else f"{valor:.1f}"
+
+    @staticmethod
+    def _leer_stream(response: requests.Response, al_recibir: Callable[[str], None]) -> Tuple[str, bool]:
+        """Lee una respuesta en streaming (eventos SSE) y deja de leer al cerrar el bloque de código.
+
+        Devuelve (código, completa): completa es False si el stream terminó sin
+        [DONE] ni bloque cerrado, o si el modelo lo cortó por max_tokens.
+        """
+        texto = ""
+        fin: Optional[str] = None
+        terminado = False
+        # text/event-stream sin charset haría que requests decodificara como ISO-8859-1;
+        # SSE es siempre UTF-8, así que se decodifica cada línea completa a mano
+        for linea in response.iter_lines(chunk_size=None):
+            linea = linea.decode('utf-8')
+            if not linea or not linea.startswith('data:'):
+                continue
+            evento = linea[len('data:'):].strip()
+            if evento == '[DONE]':
+                terminado = True
+                break
+            eleccion = json.loads(evento)['choices'][0]
+            fin = eleccion.get('finish_reason') or fin
+            fragmento = eleccion.get('delta', {}).get('content')
+            if not fragmento:
+                continue
+            texto += fragmento
+            al_recibir(ChatIAService._limpiar_codigo(texto))
+            if ChatIAService._bloque_cerrado(texto):
+                # El resto de la respuesta sería explicación; se puede ejecutar ya
+                break
+        completa = ChatIAService._bloque_cerrado(texto) or ((terminado or fin is not None) and fin != 'length')
+        return ChatIAService._limpiar_codigo(texto), completa
+
+    @staticmethod
+    def _bloque_cerrado(texto: str) -> bool:
+        """Indica si el texto ya contiene un bloque ```...``` completo"""
+        inicio = texto.find('```')
+        return inicio != -1 and texto.find('```', inicio + 3) != -1
+
+    @staticmethod
+    def _limpiar_codigo(texto: str) -> str:
+        """Quita las marcas de markdown; si hay un bloque cerrado, conserva solo su contenido"""
+        if ChatIAService._bloque_cerrado(texto):
+            inicio = texto.find('```')
+            texto = texto[inicio + 3:texto.find('```', inicio + 3)]
+            if texto.startswith('python'):
+                texto = texto[len('python'):]
+        return texto.replace('```python', '').replace('```', '').strip()
+
+    @staticmethod
+    def _intencion_local(pregunta: str, nombres: Iterable[str] = ()) -> Optional[Tuple[str, str, int]]:
+        """Reconoce preguntas simples sobre una sola métrica de toda la plantilla.
+
+        Devuelve (operación, columna, n) con operación 'maximo', 'top',
+        'promedio' o 'total' (n negativo = orden ascendente), o None si la
+        pregunta es abierta, menciona varias métricas, no pide una operación
+        conocida, o filtra los datos (umbrales, conteos, un empleado de `nombres`).
+        """
+        texto = _sin_acentos(ChatIAService._normalizar_pregunta(pregunta))
+        if len(texto.split()) > _MAX_PALABRAS_LOCALES or _PATRON_ABIERTA.search(texto):
+            return None
+        palabras = set(re.findall(r'\w+', texto))
+        for nombre in nombres:
+            nombre = _sin_acentos(str(nombre).lower())
+            if any(len(p) >= 3 and p not in _PALABRAS_NO_NOMBRE and p in palabras
+                   for p in re.findall(r'\w+', nombre)):
+                return None
+
+        columnas = set()
+        for patron, columna in _METRICAS_LOCALES:
+            texto, encontrados = patron.subn(' _ ', texto)
+            if encontrados:
+                columnas.add(columna)
+        if len(columnas) != 1:
+            return None
+        columna = columnas.pop()
+        # Cualquier número que no sea el tamaño del top es un umbral o un filtro
+        if _PATRON_FILTRO.search(texto) or re.search(r'\d', _PATRON_TOP.sub(' ', texto)):
+            return None
+
+        if _PATRON_PROMEDIO.search(texto):
+            return 'promedio', columna, 0
+        if _PATRON_TOTAL.search(texto):
+            return 'total', columna, 0
+        top = _PATRON_TOP.search(texto)
+        menos = _PATRON_MENOS.search(texto) is not None
+        if not (top or menos or _PATRON_MAS.search(texto)):
+            return None
+        if top or _PATRON_PLURAL.search(texto):
+            n = int(next((g for g in top.groups() if g), 5)) if top else 5
+            return 'top', columna, -n if menos else n
+        return ('top', columna, -1) if menos else ('maximo', columna, 1)
+
+    @instrumentar('chat_ia.responder_localmente')
+    def _responder_localmente(
+        self,
+        pregunta: str,
+        df_reporte: pd.DataFrame
+    ) -> Optional[Tuple[str, Optional[pd.DataFrame], str]]:
+        """Responde con las funciones auxiliares si la pregunta es una consulta simple.
+
+        Devuelve (texto, DataFrame, código equivalente) o None si la pregunta
+        debe ir al modelo, incluido cuando el cálculo local falla.
+        """
+        nombres = df_reporte['nombre'].dropna() if 'nombre' in df_reporte.columns else ()
+        intencion = self._intencion_local(pregunta, nombres)
+        if intencion is None or intencion[1] not in df_reporte.columns:
+            return None
+        # Columnas que quedaron como texto (celdas sin formato de tiempo) o vacías van al modelo
+        valores = df_reporte[intencion[1]]
+        if not pd.api.types.is_numeric_dtype(valores) or not valores.notna().any():
+            return None
+        try:
+            return self._calcular_respuesta_local(df_reporte, *intencion)
+        except Exception:
+            return None
+
+    def _calcular_respuesta_local(
+        self,
+        df_reporte: pd.DataFrame,
+        operacion: str,
+        columna: str,
+        n: int
+    ) -> Optional[Tuple[str, Optional[pd.DataFrame], str]]:
+        """Calcula la respuesta de _responder_localmente para una intención ya reconocida"""
+        if operacion == 'maximo':
+            texto = self._obtener_empleado_max_columna(df_reporte, columna)
+            return texto, None, f"print(df_reporte.loc[df_reporte['{columna}'].idxmax(), ['nombre', '{columna}']])"
+
+        if operacion == 'top':
+            orden = 'asc' if n < 0 else 'desc'
+            resultado = self._obtener_top_empleados_por_columna(df_reporte, columna, abs(n), orden)
+            if isinstance(resultado, str):  # Mensaje de error del auxiliar
+                return None
+            mas_menos = 'menos' if n < 0 else 'más'
+            titulo = (f"Empleado con {mas_menos} {columna}:" if abs(n) == 1
+                      else f"Top {abs(n)} empleados con {mas_menos} {columna}:")
+            return titulo, resultado, f"print(obtener_top_empleados_por_columna('{columna}', n={abs(n)}, orden='{orden}'))"
+
+        valores = df_reporte[columna]
+        valor = valores.mean() if operacion == 'promedio' else valores.sum()
+        metodo = 'mean' if operacion == 'promedio' else 'sum'
+        if pd.isna(valor):
+            texto = "N/A"
+        elif self._es_columna_tiempo(columna):
+            texto = f"{minutos_a_tiempo([round(valor)]).iloc[0]} (HH:MM)"
+        else:
+            texto = f"{valor:,.2f}".rstrip('0').rstrip('.')
+        etiqueta = 'Promedio' if operacion == 'promedio' else 'Total'
+        return f"{etiqueta} de {columna}: {texto}", None, f"print(df_reporte['{columna}'].{metodo}())"
+
+    @staticmethod
+    def _normalizar_pregunta(pregunta: str) -> str:
+        """Minúsculas, sin signos de interrogación y con espacios simples"""
+        return re.sub(r'\s+', ' ', pregunta.lower().strip(' \t\n¿?')).strip()
+
+    @staticmethod
+    def _clave_respuesta(pregunta: str, data: Dict[str, Any]) -> str:
+        """Huella de la pregunta normalizada, el prompt del sistema y los parámetros del modelo"""
+        partes = {
+            'pregunta': ChatIAService._normalizar_pregunta(pregunta),
+            'contexto': data['messages'][0]['content'],
+            'modelo': data['model'],
+            'temperatura': data['temperature'],
+            'max_tokens': data['max_tokens']
+        }
+        return hashlib.blake2b(json.dumps(partes, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+    @staticmethod
+    def _buscar_respuesta(clave: str) -> Optional[str]:
+        """Código guardado para la clave, primero en memoria y luego en disco"""
+        codigo = _cache_respuestas.obtener(clave)
+        if codigo is not None or _cache_respuestas_disco is None:
+            return codigo
+
+        def leer(ruta: str) -> Optional[str]:
+            with open(ruta, encoding='utf-8') as f:
+                entrada = json.load(f)
+            ttl = _config.CACHE_IA_TTL_HORAS * 3600
+            if ttl and time.time() - entrada['creado'] > ttl:
+                return None
+            return entrada['codigo']
+
+        codigo = _cache_respuestas_disco.obtener(clave, leer)
+        if codigo is not None:
+            _cache_respuestas.guardar(clave, codigo)
+        return codigo
+
+    @staticmethod
+    def _guardar_respuesta(clave: str, codigo: str) -> None:
+        """Guarda una respuesta correcta; los errores nunca se guardan"""
+        _cache_respuestas.guardar(clave, codigo)
+        if _cache_respuestas_disco is None:
+            return
+
+        def escribir(ruta: str) -> None:
+            with open(ruta, 'w', encoding='utf-8') as f:
+                json.dump({'codigo': codigo, 'creado': time.time()}, f, ensure_ascii=False)
+
+        try:
+            _cache_respuestas_disco.guardar(clave, escribir)
+        except OSError:
+            # Sin permisos o sin espacio: la caché en memoria sigue funcionando
+            pass
+
+    @staticmethod
+    def limpiar_cache(disco: bool = False) -> None:
+        """Vacía la caché de respuestas del modelo (y la copia en disco si se indica)"""
+        _cache_respuestas.limpiar()
+        _cache_contextos.limpiar()
+        if disco and _cache_respuestas_disco is not None:
+            _cache_respuestas_disco.limpiar()
+
+    @instrumentar('chat_ia.ejecutar_codigo_aislado')
+    def _ejecutar_codigo_aislado(
+        self,
+        codigo: str,
+        df_reporte: pd.DataFrame,
+        huella: Optional[str] = None
+    ) -> Tuple[str, Optional[pd.DataFrame]]:
+        """Ejecuta el código en un proceso del pool de ejecución (o aquí mismo si está desactivado)"""
+        if not self.config.EJECUCION_AISLADA:
+            return self._ejecutar_codigo(codigo, df_reporte)
+        try:
+            return obtener_ejecutor().ejecutar(codigo, df_reporte, huella or huella_dataframe(df_reporte))
+        except Exception as e:
+            return f"Error al ejecutar consulta: {str(e)}", None
+
+    @staticmethod
+    def preparar_ejecucion() -> None:
+        """Inicia los procesos de ejecución para que la primera consulta no espere su arranque"""
+        if Config().EJECUCION_AISLADA:
+            obtener_ejecutor()
+
+    @instrumentar('chat_ia.ejecutar_codigo')
     def _ejecutar_codigo(self, codigo: str, df_reporte: pd.DataFrame) -> Tuple[str, Optional[pd.DataFrame]]:
-        """Ejecuta código pandas y captura tanto texto como DataFrames"""
+        """Ejecuta código pandas y captura tanto texto como DataFrames.
+
+        print() guarda los DataFrames y Series tal cual, sin convertirlos a texto.
+        La última tabla impresa se devuelve como resultado; las anteriores se
+        escriben en el texto (acotadas) en el orden en que se imprimieron.
+        """
         try:
-            # Variables para capturar resultados
-            resultado_texto = ""
-            resultado_df = None
+            # Texto y tablas en el orden en que se imprimen
+            salida: List[Union[str, pd.DataFrame]] = []
+            # Copia superficial: df_reporte es el reporte en caché que comparten
+            # otras consultas y sesiones, el código no debe poder alterarlo
+            df_reporte = df_reporte.copy(deep=False)
             
             # Contexto seguro con funciones auxiliares
             contexto_seguro = {
@@ -158,11 +575,12 @@ GENERA SOLO CÓDIGO PYTHON, SIN EXPLICACIONES.
                 'np': np,
                 'convertir_tiempo_a_minutos': self._convertir_tiempo_a_minutos,
                 'convertir_tiempo_a_horas_decimales': self._convertir_tiempo_a_horas_decimales,
-                'obtener_empleado_max_tiempo_extra': lambda: self._obtener_empleado_max_columna(df_reporte, 'Tiempo Extra'),
-                'obtener_empleado_max_horas_trabajadas': lambda: self._obtener_empleado_max_columna(df_reporte, 'Horas Trabajadas'),
+                'formatear_minutos': minutos_a_tiempo,
+                'obtener_empleado_max_tiempo_extra': lambda: self._obtener_empleado_max_columna(df_reporte, 'tiempo_extra'),
+                'obtener_empleado_max_horas_trabajadas': lambda: self._obtener_empleado_max_columna(df_reporte, 'horas_trabajadas'),
                 'obtener_top_empleados_por_columna': lambda columna, n=5, orden='desc': self._obtener_top_empleados_por_columna(df_reporte, columna, n, orden),
                 '__builtins__': {
-                    'print': self._custom_print,
+                    'print': lambda *args, **kwargs: self._capturar_print(salida, *args, **kwargs),
                     'int': int,
                     'float': float,
                     'str': str,
@@ -183,55 +601,85 @@ GENERA SOLO CÓDIGO PYTHON, SIN EXPLICACIONES.
                 }
             }
             
-            # Buffer para capturar output
-            self._output_buffer = StringIO()
-            
             # Ejecutar código
             exec(codigo, contexto_seguro)
             
-            # Obtener resultado de texto
-            resultado_texto = self._output_buffer.getvalue()
-            
-            # Intentar extraer DataFrame del resultado si es posible
-            if 'print(' in codigo:
-                # Si el último comando fue un print, verificar si contenía un DataFrame
-                last_line = codigo.strip().split('\n')[-1]
-                if 'print(' in last_line and '[' in last_line and ']' in last_line:
-                    try:
-                        # Extraer la expresión antes del print
-                        expr = last_line.split('print(')[1].rsplit(')', 1)[0]
-                        resultado_df = eval(expr, contexto_seguro)
-                        if isinstance(resultado_df, pd.DataFrame):
-                            # Limpiar el texto del resultado si mostramos el DataFrame aparte
-                            resultado_texto = resultado_texto.replace(str(resultado_df), '').strip()
-                    except:
-                        pass
-                
-            return resultado_texto, resultado_df if isinstance(resultado_df, pd.DataFrame) else None
+            # La última tabla es el resultado; el resto de la salida queda como texto
+            tablas = [i for i, parte in enumerate(salida) if isinstance(parte, pd.DataFrame)]
+            resultado_df = salida[tablas[-1]] if tablas else None
+            resultado_texto = "".join(
+                parte if isinstance(parte, str) else parte.to_string(max_rows=TABLA_EN_TEXTO_MAX_FILAS) + "\n"
+                for i, parte in enumerate(salida) if not tablas or i != tablas[-1]
+            )
+            return resultado_texto, resultado_df
             
         except Exception as e:
             return f"Error al ejecutar consulta: {str(e)}", None
 
     # Funciones auxiliares para el contexto de ejecución
-    def _custom_print(self, *args, **kwargs):
-        """Función print personalizada para capturar output"""
-        print(*args, file=self._output_buffer, **kwargs)
+    @staticmethod
+    def _capturar_print(salida: List[Union[str, pd.DataFrame]], *args, sep: Optional[str] = ' ',
+                        end: Optional[str] = '\n', **kwargs) -> None:
+        """print() del código generado: agrega el texto a `salida` y las tablas como objetos"""
+        sep = ' ' if sep is None else sep
+        end = '\n' if end is None else end
+        texto: List[str] = []
+        for valor in args:
+            tabla = ChatIAService._como_tabla(valor)
+            if tabla is None:
+                texto.append(str(valor))
+                continue
+            if texto:
+                salida.append(sep.join(texto) + '\n')
+                texto = []
+            salida.append(tabla)
+        if texto:
+            salida.append(sep.join(texto) + end)
+
+    @staticmethod
+    def _como_tabla(valor) -> Optional[pd.DataFrame]:
+        """DataFrame para mostrar un DataFrame o Series impreso; None si no es tabular.
+
+        Los índices con nombre o no enteros (groupby, value_counts) pasan a ser
+        columnas, porque la interfaz oculta el índice; si una columna se llama
+        igual que el índice (groupby('nombre')['nombre'].count()) se renombra.
+        Si la tabla no se puede convertir, devuelve None y se imprime como texto.
+        """
+        if isinstance(valor, pd.Series):
+            valor = valor.to_frame(name=valor.name if valor.name is not None else 'valor')
+        if not isinstance(valor, pd.DataFrame):
+            return None
+        if any(nombre is not None for nombre in valor.index.names) or not pd.api.types.is_integer_dtype(valor.index):
+            repetidas = set(valor.columns) & {n if n is not None else 'index' for n in valor.index.names}
+            try:
+                valor = valor.rename(columns={c: f"{c}_valor" for c in repetidas}).reset_index()
+            except (ValueError, TypeError):
+                return None
+        return valor
 
     def _convertir_tiempo_a_minutos(self, tiempo_str) -> int:
-        """Convierte formato HH:MM a minutos de forma segura"""
-        try:
-            if pd.isna(tiempo_str) or str(tiempo_str).strip() in ['N/A', '', '0:00', '00:00']:
-                return 0
-            tiempo_str = str(tiempo_str).strip()
-            if ':' not in tiempo_str:
-                return 0
-            partes = tiempo_str.split(':')
-            if len(partes) != 2:
-                return 0
-            horas, minutos = int(partes[0]), int(partes[1])
-            return horas * 60 + minutos
-        except:
-            return 0
+        """Convierte formato HH:MM (o -HH:MM) a minutos de forma segura; los números ya son minutos"""
+        if isinstance(tiempo_str, (int, float, np.number)) and not pd.isna(tiempo_str):
+            return int(tiempo_str)
+        return tiempo_a_minutos(tiempo_str, duracion=True)
+
+    def _columna_en_minutos(self, df: pd.DataFrame, columna: str) -> pd.Series:
+        """Devuelve una columna de duración en minutos; las celdas mal formadas quedan como NaN"""
+        if pd.api.types.is_numeric_dtype(df[columna]):
+            return df[columna].astype('float64')
+        minutos, validos = serie_a_minutos(df[columna], duracion=True)
+        return pd.Series(minutos, index=df.index).where(validos)
+
+    @staticmethod
+    def _es_columna_tiempo(columna: str) -> bool:
+        """Indica si la columna guarda duraciones (minutos o HH:MM)"""
+        nombre = columna.lower()
+        return 'tiempo' in nombre or 'horas' in nombre or 'diferencia' in nombre
+
+    @staticmethod
+    def _columna_nombre(df: pd.DataFrame) -> str:
+        """Nombre de la columna con el nombre del empleado"""
+        return 'nombre' if 'nombre' in df.columns else 'Nombre'
 
     def _convertir_tiempo_a_horas_decimales(self, tiempo_str) -> float:
         """Convierte formato HH:MM a horas decimales"""
@@ -244,15 +692,17 @@ GENERA SOLO CÓDIGO PYTHON, SIN EXPLICACIONES.
             if columna not in df.columns:
                 return f"La columna '{columna}' no existe"
             
-            if 'Tiempo' in columna or 'Horas' in columna:
-                df_temp = df.copy()
-                df_temp['temp_minutos'] = df_temp[columna].apply(self._convertir_tiempo_a_minutos)
-                max_idx = df_temp['temp_minutos'].idxmax()
+            valor = df[columna]
+            if self._es_columna_tiempo(columna):
+                minutos = self._columna_en_minutos(df, columna)
+                max_idx = minutos.idxmax()
+                if pd.api.types.is_numeric_dtype(valor):
+                    valor = minutos_a_tiempo(valor)
             else:
                 max_idx = df[columna].idxmax()
             
             max_empleado = df.loc[max_idx]
-            return f"Empleado con máximo {columna}: {max_empleado['Nombre']} ({max_empleado[columna]})"
+            return f"Empleado con máximo {columna}: {max_empleado[self._columna_nombre(df)]} ({valor.loc[max_idx]})"
         except Exception as e:
             return f"Error al calcular máximo {columna}: {str(e)}"
 
@@ -262,40 +712,21 @@ GENERA SOLO CÓDIGO PYTHON, SIN EXPLICACIONES.
             if columna not in df.columns:
                 return f"La columna '{columna}' no existe"
             
-            df_temp = df.copy()
-            
-            # Si es una columna de tiempo, convertir a minutos
-            if 'Tiempo' in columna or 'Horas' in columna:
-                df_temp[f'{columna}_Minutos'] = df_temp[columna].apply(self._convertir_tiempo_a_minutos)
-                columna_ordenar = f'{columna}_Minutos'
+            # Si es una columna de tiempo, ordenar por minutos
+            if self._es_columna_tiempo(columna):
+                valores = self._columna_en_minutos(df, columna)
             else:
-                columna_ordenar = columna
+                valores = df[columna]
             
             # Ordenar
             if orden == 'desc':
-                df_resultado = df_temp.nlargest(n, columna_ordenar)
+                indices = valores.nlargest(n).index
             else:
-                df_resultado = df_temp.nsmallest(n, columna_ordenar)
+                indices = valores.nsmallest(n).index
             
-            return df_resultado[['Nombre', columna]]
+            df_resultado = df.loc[indices, [self._columna_nombre(df), columna]]
+            if self._es_columna_tiempo(columna) and pd.api.types.is_numeric_dtype(df[columna]):
+                df_resultado[columna] = minutos_a_tiempo(df_resultado[columna])
+            return df_resultado
         except Exception as e:
             return f"Error al obtener top empleados: {str(e)}"
-
-    def _obtener_info_dataframe(self, df: pd.DataFrame) -> Tuple[str, str]:
-        """Obtiene información detallada del DataFrame"""
-        # Capturar info()
-        old_stdout = sys.stdout
-        sys.stdout = buffer = StringIO()
-        df.info(buf=buffer, verbose=True)
-        sys.stdout = old_stdout
-        info_str = buffer.getvalue()
-        
-        # Obtener dtypes
-        dtypes_info = []
-        for col in df.columns:
-            dtype = str(df[col].dtype)
-            unique_count = df[col].nunique()
-            sample_values = df[col].dropna().head(3).tolist()
-            dtypes_info.append(f"  {col}: {dtype} (únicos: {unique_count}, ejemplos: {sample_values})")
-        
-        return info_str, "\n".join(dtypes_info)
\ No newline at end of file
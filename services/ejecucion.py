@@ -0,0 +1,269 @@
+"""Ejecución aislada del código generado por el modelo.
+
+El código se ejecuta en procesos trabajadores que se reutilizan entre
+consultas (ya tienen pandas importado). Cada consulta tiene un
+límite de tiempo real, de tiempo de CPU y de memoria residente; si el código
+los excede, el trabajador se termina y se reemplaza sin afectar al servidor
+de Streamlit ni a otras sesiones.
+
+Con pyarrow, el DataFrame del reporte no viaja por el pipe: se escribe una
+vez por huella como archivo Arrow IPC (en /dev/shm cuando existe, es decir,
+en memoria) y los trabajadores lo abren con memoria mapeada. Sin pyarrow se
+envía por el pipe (pickle), solo a los trabajadores que aún no lo tienen.
+"""
+import importlib.util
+import multiprocessing
+import os
+import queue
+import signal
+import tempfile
+import threading
+import time
+import warnings
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from utils.cache import CacheDisco
+from utils.config import Config
+
+try:
+    import resource
+except ImportError:  # Windows: solo se aplica el límite de tiempo real
+    resource = None
+
+_config = Config()
+
+# Espera máxima a que un trabajador nuevo termine de importar sus dependencias
+ESPERA_INICIO_SEGUNDOS = 60
+# Cada cuánto se revisa la memoria del trabajador mientras ejecuta
+INTERVALO_REVISION = 0.05
+
+_HAY_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+def _directorio_datos() -> str:
+    """Directorio para los DataFrames compartidos; /dev/shm los mantiene en memoria"""
+    if _config.EJECUCION_DATOS_DIR:
+        return _config.EJECUCION_DATOS_DIR
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    # /dev/shm lo comparten todos los usuarios: un directorio por usuario
+    sufijo = f"-{os.getuid()}" if hasattr(os, 'getuid') else ''
+    return os.path.join(base, f'asistencia-ejecucion{sufijo}')
+
+def _preparar_directorio(directorio: str) -> None:
+    """Crea el directorio solo accesible por el usuario actual (contiene datos de empleados)"""
+    os.makedirs(directorio, mode=0o700, exist_ok=True)
+    if not hasattr(os, 'getuid'):
+        return
+    estado = os.stat(directorio)
+    if estado.st_uid != os.getuid():
+        raise RuntimeError(f"El directorio de ejecución {directorio} pertenece a otro usuario")
+    if estado.st_mode & 0o077:
+        os.chmod(directorio, 0o700)
+
+def _escribir_arrow(df: pd.DataFrame, ruta: str) -> None:
+    import pyarrow as pa
+    # Se crea con permisos 0600 antes de que pyarrow lo abra (y trunque)
+    os.close(os.open(ruta, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600))
+    tabla = pa.Table.from_pandas(df, preserve_index=True)
+    with pa.OSFile(ruta, 'wb') as destino, pa.ipc.new_file(destino, tabla.schema) as escritor:
+        escritor.write_table(tabla)
+
+def _leer_arrow(ruta: str) -> pd.DataFrame:
+    import pyarrow as pa
+    with pa.memory_map(ruta) as origen:
+        return pa.ipc.open_file(origen).read_all().to_pandas()
+
+def _memoria_residente(pid: int) -> Optional[int]:
+    """RSS del proceso en bytes (solo Linux, vía /proc); None si no se puede medir"""
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+class LimiteCPUExcedido(Exception):
+    pass
+
+def _al_exceder_cpu(signum, frame):
+    raise LimiteCPUExcedido("Se excedió el límite de tiempo de CPU")
+
+def _limitar_cpu(segundos: Optional[float]) -> None:
+    """Fija el límite suave de CPU a `segundos` más el tiempo ya consumido (None lo quita)"""
+    if resource is None:
+        return
+    _, duro = resource.getrlimit(resource.RLIMIT_CPU)
+    if segundos is None:
+        suave = duro
+    else:
+        uso = resource.getrusage(resource.RUSAGE_SELF)
+        suave = int(uso.ru_utime + uso.ru_stime + segundos) + 1
+        if duro != resource.RLIM_INFINITY:
+            suave = min(suave, duro)
+    resource.setrlimit(resource.RLIMIT_CPU, (suave, duro))
+
+def _bucle_trabajador(conexion, limite_cpu: float) -> None:
+    """Proceso trabajador: recibe (código, clave de datos, DataFrame o None) y devuelve (texto, DataFrame).
+
+    La clave es la ruta del archivo Arrow, o la huella si el DataFrame viene por el pipe.
+    """
+    warnings.filterwarnings('ignore')
+    from services.chat_ia import ChatIAService
+    if resource is not None and hasattr(signal, 'SIGXCPU'):
+        signal.signal(signal.SIGXCPU, _al_exceder_cpu)
+
+    servicio = ChatIAService()
+    datos: Dict[str, pd.DataFrame] = {}
+    conexion.send('listo')
+    while True:
+        try:
+            mensaje = conexion.recv()
+        except EOFError:
+            break
+        if mensaje is None:
+            break
+        codigo, clave, df = mensaje
+        try:
+            if clave not in datos:
+                datos.clear()
+                datos[clave] = df if df is not None else _leer_arrow(clave)
+            _limitar_cpu(limite_cpu or None)
+            try:
+                # Copia superficial: el código no puede alterar el DataFrame de la siguiente consulta
+                resultado = servicio._ejecutar_codigo(codigo, datos[clave].copy(deep=False))
+            finally:
+                _limitar_cpu(None)
+        except Exception as e:
+            resultado = (f"Error al ejecutar consulta: {str(e)}", None)
+        conexion.send(resultado)
+
+class _Trabajador:
+    def __init__(self, contexto, limite_cpu: float):
+        self.conexion, conexion_hijo = contexto.Pipe()
+        self.proceso = contexto.Process(
+            target=_bucle_trabajador, args=(conexion_hijo, limite_cpu), daemon=True
+        )
+        self.proceso.start()
+        conexion_hijo.close()
+        self.listo = False
+        # Huella del DataFrame recibido por el pipe (solo sin pyarrow)
+        self.huella: Optional[str] = None
+
+    def esperar_inicio(self) -> None:
+        if not self.listo:
+            if not self.conexion.poll(ESPERA_INICIO_SEGUNDOS):
+                raise RuntimeError("El proceso de ejecución no respondió al iniciar")
+            self.conexion.recv()
+            self.listo = True
+
+    def terminar(self) -> None:
+        if self.proceso.is_alive():
+            self.proceso.kill()
+        self.proceso.join(timeout=1)
+        self.conexion.close()
+
+class EjecutorAislado:
+    """Pool de procesos que ejecutan código con límites de tiempo, CPU y memoria"""
+
+    def __init__(
+        self,
+        procesos: int = 2,
+        limite_segundos: float = 10,
+        limite_cpu_segundos: float = 5,
+        limite_memoria_mb: int = 1024,
+        directorio: Optional[str] = None
+    ):
+        self.procesos = max(procesos, 1)
+        self.limite_segundos = limite_segundos
+        self.limite_cpu_segundos = limite_cpu_segundos
+        self.limite_memoria = limite_memoria_mb * 1024 * 1024
+        self._contexto = multiprocessing.get_context('spawn')
+        self._libres: "queue.Queue[_Trabajador]" = queue.Queue()
+        self._datos = CacheDisco(
+            directorio or _directorio_datos(), _config.EJECUCION_DATOS_MAX_MB * 1024 * 1024, '.arrow'
+        ) if _HAY_PYARROW else None
+        if self._datos is not None:
+            _preparar_directorio(self._datos.directorio)
+        for _ in range(self.procesos):
+            self._libres.put(self._nuevo_trabajador())
+
+    def _nuevo_trabajador(self) -> _Trabajador:
+        return _Trabajador(self._contexto, self.limite_cpu_segundos)
+
+    def _ruta_datos(self, df: pd.DataFrame, huella: str) -> str:
+        """Escribe el DataFrame la primera vez que se usa esa huella"""
+        ruta = self._datos.ruta(huella)
+        if os.path.exists(ruta):
+            os.utime(ruta)
+        else:
+            self._datos.guardar(huella, lambda temporal: _escribir_arrow(df, temporal))
+        return ruta
+
+    def ejecutar(self, codigo: str, df: pd.DataFrame, huella: str) -> Tuple[str, Optional[pd.DataFrame]]:
+        """Ejecuta el código sobre `df` (disponible como df_reporte) en un trabajador del pool"""
+        if self._datos is not None:
+            mensaje = (codigo, self._ruta_datos(df, huella), None)
+        try:
+            trabajador = self._libres.get(timeout=self.limite_segundos)
+        except queue.Empty:
+            return (f"Error al ejecutar consulta: no hubo un proceso de ejecución libre en "
+                    f"{self.limite_segundos:g} segundos"), None
+        if self._datos is None:
+            mensaje = (codigo, huella, None if trabajador.huella == huella else df)
+        reemplazar = True
+        try:
+            trabajador.esperar_inicio()
+            trabajador.conexion.send(mensaje)
+            trabajador.huella = huella
+            limite = time.monotonic() + self.limite_segundos
+            while not trabajador.conexion.poll(INTERVALO_REVISION):
+                if not trabajador.proceso.is_alive():
+                    return "Error al ejecutar consulta: el proceso de ejecución terminó inesperadamente", None
+                if time.monotonic() > limite:
+                    return (f"Error al ejecutar consulta: se excedió el límite de "
+                            f"{self.limite_segundos:g} segundos"), None
+                memoria = _memoria_residente(trabajador.proceso.pid)
+                if memoria is not None and memoria > self.limite_memoria:
+                    return (f"Error al ejecutar consulta: se excedió el límite de memoria "
+                            f"({self.limite_memoria // (1024 * 1024)} MB)"), None
+            resultado = trabajador.conexion.recv()
+            reemplazar = False
+            return resultado
+        except (EOFError, OSError):
+            return "Error al ejecutar consulta: el proceso de ejecución terminó inesperadamente", None
+        finally:
+            if reemplazar:
+                trabajador.terminar()
+                trabajador = self._nuevo_trabajador()
+            self._libres.put(trabajador)
+
+    def cerrar(self) -> None:
+        """Detiene los trabajadores y borra los DataFrames compartidos"""
+        while True:
+            try:
+                trabajador = self._libres.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                trabajador.conexion.send(None)
+            except OSError:
+                pass
+            trabajador.terminar()
+        if self._datos is not None:
+            self._datos.limpiar()
+
+_ejecutor: Optional[EjecutorAislado] = None
+_lock_ejecutor = threading.Lock()
+
+def obtener_ejecutor() -> EjecutorAislado:
+    """Crea (una sola vez) el pool de ejecución con los límites de la configuración"""
+    global _ejecutor
+    with _lock_ejecutor:
+        if _ejecutor is None:
+            _ejecutor = EjecutorAislado(
+                procesos=_config.EJECUCION_PROCESOS,
+                limite_segundos=_config.EJECUCION_LIMITE_SEGUNDOS,
+                limite_cpu_segundos=_config.EJECUCION_LIMITE_CPU_SEGUNDOS,
+                limite_memoria_mb=_config.EJECUCION_LIMITE_MEMORIA_MB
+            )
+        return _ejecutor
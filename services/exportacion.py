@@ -0,0 +1,117 @@
+import io
+import importlib.util
+import pandas as pd
+import xlsxwriter
+from typing import Dict, List, Tuple
+from models.asistencia import ReporteAsistencia
+from utils.cache import CacheLRU, huella_dataframe
+from utils.config import Config
+from utils.instrumentacion import instrumentar
+from .reporte import ReporteService
+
+# Extensión y tipo MIME de cada formato de descarga
+FORMATOS_EXPORTACION: Dict[str, Tuple[str, str]] = {
+    'xlsx': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': ('csv', 'text/csv'),
+    'parquet': ('parquet', 'application/vnd.apache.parquet')
+}
+
+# Filas que se formatean y escriben a la vez; limita la memoria en reportes grandes
+FILAS_POR_BLOQUE = 10_000
+
+_config = Config()
+_cache_exportaciones = CacheLRU(
+    max_entradas=_config.CACHE_EXPORTACIONES_MAX_ENTRADAS,
+    max_bytes=_config.CACHE_EXPORTACIONES_MAX_MB * 1024 * 1024,
+    medir_tamano=len
+)
+
+class ExportacionService:
+    @staticmethod
+    def formatos_disponibles() -> List[str]:
+        """Formatos de descarga; Parquet solo si pyarrow está instalado"""
+        formatos = ['xlsx', 'csv']
+        if importlib.util.find_spec('pyarrow') is not None:
+            formatos.append('parquet')
+        return formatos
+
+    @staticmethod
+    @instrumentar('exportacion.exportar')
+    def exportar(reporte: ReporteAsistencia, formato: str = 'xlsx') -> bytes:
+        """Serializa el reporte en el formato pedido.
+
+        El resultado se guarda en caché por huella del reporte y formato, así que
+        solo se genera la primera vez que se descarga. Excel y CSV llevan las
+        duraciones en 'HH:MM'; Parquet conserva los tipos compactos (minutos).
+        """
+        if formato not in FORMATOS_EXPORTACION:
+            raise ValueError(f"Formato de exportación desconocido: '{formato}'")
+        clave = (reporte.huella or huella_dataframe(reporte.datos), formato)
+        contenido = _cache_exportaciones.obtener(clave)
+        if contenido is None:
+            exportadores = {
+                'xlsx': ExportacionService._exportar_excel,
+                'csv': ExportacionService._exportar_csv,
+                'parquet': ExportacionService._exportar_parquet
+            }
+            contenido = exportadores[formato](reporte.datos)
+            _cache_exportaciones.guardar(clave, contenido)
+        return contenido
+
+    @staticmethod
+    def nombre_archivo(formato: str, fecha: str) -> str:
+        return f"reporte_asistencias_{fecha}.{FORMATOS_EXPORTACION[formato][0]}"
+
+    @staticmethod
+    def tipo_mime(formato: str) -> str:
+        return FORMATOS_EXPORTACION[formato][1]
+
+    @staticmethod
+    def _bloques_formateados(df_reporte: pd.DataFrame):
+        """Filas del reporte formateadas para Excel/CSV, por bloques y con nulos como None"""
+        for inicio in range(0, len(df_reporte), FILAS_POR_BLOQUE):
+            bloque = ReporteService.formatear_reporte(df_reporte.iloc[inicio:inicio + FILAS_POR_BLOQUE])
+            yield bloque.astype(object).where(bloque.notna(), None).to_numpy().tolist()
+
+    @staticmethod
+    def _exportar_excel(df_reporte: pd.DataFrame) -> bytes:
+        """Escribe el Excel fila por fila con xlsxwriter en modo de memoria constante.
+
+        pandas.to_excel escribe por columnas, lo que no es compatible con
+        constant_memory (solo admite filas en orden), por eso se escribe directo.
+        """
+        salida = io.BytesIO()
+        libro = xlsxwriter.Workbook(salida, {'constant_memory': True})
+        hoja = libro.add_worksheet('Reporte_Asistencias')
+        encabezado = libro.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+        hoja.set_column(0, 0, 40)
+        hoja.set_column(1, len(df_reporte.columns) - 1, 16)
+        hoja.write_row(0, 0, list(df_reporte.columns), encabezado)
+        fila = 1
+        for bloque in ExportacionService._bloques_formateados(df_reporte):
+            for valores in bloque:
+                hoja.write_row(fila, 0, valores)
+                fila += 1
+        libro.close()
+        return salida.getvalue()
+
+    @staticmethod
+    def _exportar_csv(df_reporte: pd.DataFrame) -> bytes:
+        """CSV en UTF-8 con BOM para que Excel muestre bien los acentos"""
+        salida = io.StringIO()
+        for numero, inicio in enumerate(range(0, max(len(df_reporte), 1), FILAS_POR_BLOQUE)):
+            bloque = ReporteService.formatear_reporte(df_reporte.iloc[inicio:inicio + FILAS_POR_BLOQUE])
+            bloque.to_csv(salida, index=False, header=numero == 0)
+        return salida.getvalue().encode('utf-8-sig')
+
+    @staticmethod
+    def _exportar_parquet(df_reporte: pd.DataFrame) -> bytes:
+        """Parquet con los tipos del reporte (categorías y minutos enteros); requiere pyarrow"""
+        salida = io.BytesIO()
+        df_reporte.to_parquet(salida, index=False, engine='pyarrow', compression='zstd')
+        return salida.getvalue()
+
+    @staticmethod
+    def limpiar_cache() -> None:
+        """Vacía la caché de archivos exportados"""
+        _cache_exportaciones.limpiar()
@@ -0,0 +1,191 @@
+import os
+import re
+import pandas as pd
+from typing import Dict, List, Optional, Sequence
+from models.asistencia import LibroAsistencia, ReporteAsistencia
+from utils.config import Config
+from utils.instrumentacion import instrumentar
+
+# Periodos quincenales ordenables como texto: 2025-06-Q1, 2025-06-Q2, ...
+PATRON_PERIODO = re.compile(r'^\d{4}-(0[1-9]|1[0-2])-Q[12]$')
+_PATRON_SEDE = re.compile(r'^[\w\-. ]+$')
+
+TABLA_REPORTES = 'reportes'
+TABLA_DIAS = 'dias'
+ARCHIVO_PARTICION = 'datos.parquet'
+
+_config = Config()
+
+def _pyarrow():
+    """Importa pyarrow solo cuando se usa el historial (dependencia opcional)"""
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("El historial requiere pyarrow: pip install pyarrow") from e
+    return pyarrow
+
+def _esquema_reportes():
+    """Tipos fijos para que todas las particiones sean compatibles entre sí"""
+    pa = _pyarrow()
+    return pa.schema([
+        ('nombre', pa.string()),
+        ('horas_trabajadas', pa.int32()),
+        ('dias_trabajados', pa.int16()),
+        ('dias_descanso', pa.int16()),
+        ('faltas', pa.float32()),
+        ('registro_mal', pa.int16()),
+        ('retardos', pa.int16()),
+        ('diferencia_total', pa.int32()),
+        ('tiempo_extra', pa.int32())
+    ])
+
+def _esquema_dias():
+    pa = _pyarrow()
+    return pa.schema([
+        ('nombre', pa.string()),
+        ('tipo', pa.string()),
+        ('dia', pa.int8()),
+        ('estado', pa.int8()),
+        ('minutos', pa.int32())
+    ])
+
+class HistorialService:
+    """Almacén local de reportes y matrices de días en Parquet.
+
+    Los datos se guardan particionados por periodo y sede con el formato
+    `tabla/periodo=.../sede=.../datos.parquet`, así que una consulta solo abre
+    las particiones y columnas que pide. Guardar de nuevo un periodo y sede
+    reemplaza su partición.
+    """
+
+    def __init__(self, directorio: Optional[str] = None):
+        self.directorio = directorio or _config.HISTORIAL_DIR
+
+    @instrumentar('historial.agregar')
+    def agregar(
+        self,
+        reporte: ReporteAsistencia,
+        periodo: str,
+        sede: str = 'general',
+        libros: Optional[Dict[str, LibroAsistencia]] = None
+    ) -> None:
+        """Guarda el reporte (y, si se dan, las matrices de días de cada libro)"""
+        self._validar_particion(periodo, sede)
+        pa = _pyarrow()
+
+        df_reporte = reporte.datos.assign(nombre=reporte.datos['nombre'].astype(str))
+        tabla = pa.Table.from_pandas(df_reporte, schema=_esquema_reportes(), preserve_index=False)
+        self._escribir(TABLA_REPORTES, periodo, sede, tabla)
+
+        if libros:
+            partes = [self._dias_en_largo(tipo, libro) for tipo, libro in libros.items()]
+            tabla_dias = pa.Table.from_pandas(
+                pd.concat(partes, ignore_index=True), schema=_esquema_dias(), preserve_index=False
+            )
+            self._escribir(TABLA_DIAS, periodo, sede, tabla_dias)
+
+    def consultar_reportes(
+        self,
+        columnas: Optional[Sequence[str]] = None,
+        periodos: Optional[Sequence[str]] = None,
+        sedes: Optional[Sequence[str]] = None
+    ) -> pd.DataFrame:
+        """Lee los reportes guardados; solo abre las columnas y particiones pedidas"""
+        return self._consultar(TABLA_REPORTES, columnas, periodos, sedes)
+
+    def consultar_dias(
+        self,
+        columnas: Optional[Sequence[str]] = None,
+        periodos: Optional[Sequence[str]] = None,
+        sedes: Optional[Sequence[str]] = None,
+        tipos: Optional[Sequence[str]] = None
+    ) -> pd.DataFrame:
+        """Lee las matrices de días (una fila por empleado, tipo de archivo y día)"""
+        return self._consultar(TABLA_DIAS, columnas, periodos, sedes, tipos)
+
+    def periodos(self, sede: Optional[str] = None) -> List[str]:
+        """Periodos guardados en orden cronológico (solo lista directorios)"""
+        raiz = os.path.join(self.directorio, TABLA_REPORTES)
+        if not os.path.isdir(raiz):
+            return []
+        encontrados = []
+        for entrada in os.listdir(raiz):
+            if not entrada.startswith('periodo='):
+                continue
+            if sede is None or os.path.exists(os.path.join(raiz, entrada, f"sede={sede}", ARCHIVO_PARTICION)):
+                encontrados.append(entrada.split('=', 1)[1])
+        return sorted(encontrados)
+
+    def serie_por_empleado(
+        self,
+        columna: str,
+        ultimos: int = 12,
+        sedes: Optional[Sequence[str]] = None
+    ) -> pd.DataFrame:
+        """Valores de una columna por empleado (filas) en los últimos periodos (columnas).
+
+        Si un empleado aparece en varias sedes en el mismo periodo, se suman.
+        """
+        periodos = self.periodos() if not sedes or len(sedes) != 1 else self.periodos(sedes[0])
+        periodos = periodos[-ultimos:] if ultimos else periodos
+        if not periodos:
+            return pd.DataFrame()
+        df = self.consultar_reportes(['nombre', columna], periodos=periodos, sedes=sedes)
+        return df.pivot_table(index='nombre', columns='periodo', values=columna, aggfunc='sum', observed=True)
+
+    def _consultar(
+        self,
+        tabla: str,
+        columnas: Optional[Sequence[str]],
+        periodos: Optional[Sequence[str]],
+        sedes: Optional[Sequence[str]],
+        tipos: Optional[Sequence[str]] = None
+    ) -> pd.DataFrame:
+        pa = _pyarrow()
+        raiz = os.path.join(self.directorio, tabla)
+        if not os.path.isdir(raiz):
+            return pd.DataFrame(columns=list(columnas or []) + ['periodo', 'sede'])
+
+        particiones = pa.dataset.partitioning(
+            pa.schema([('periodo', pa.string()), ('sede', pa.string())]), flavor='hive'
+        )
+        datos = pa.dataset.dataset(raiz, format='parquet', partitioning=particiones)
+        filtro = None
+        for campo, valores in (('periodo', periodos), ('sede', sedes), ('tipo', tipos)):
+            if valores is not None:
+                condicion = pa.dataset.field(campo).isin(list(valores))
+                filtro = condicion if filtro is None else filtro & condicion
+        if columnas is not None:
+            columnas = list(dict.fromkeys([*columnas, 'periodo', 'sede']))
+        return datos.to_table(columns=columnas, filter=filtro).to_pandas()
+
+    def _escribir(self, tabla: str, periodo: str, sede: str, datos) -> None:
+        """Escribe la partición completa de forma atómica (archivo temporal y reemplazo)"""
+        pa = _pyarrow()
+        directorio = os.path.join(self.directorio, tabla, f"periodo={periodo}", f"sede={sede}")
+        os.makedirs(directorio, exist_ok=True)
+        temporal = os.path.join(directorio, f".{ARCHIVO_PARTICION}.tmp")
+        pa.parquet.write_table(datos, temporal, compression='zstd')
+        os.replace(temporal, os.path.join(directorio, ARCHIVO_PARTICION))
+
+    @staticmethod
+    def _dias_en_largo(tipo: str, libro: LibroAsistencia) -> pd.DataFrame:
+        """Convierte la matriz de días de un libro a formato largo (empleado, día)"""
+        dias = libro.dias
+        empleados, total_dias = dias.estados.shape
+        return pd.DataFrame({
+            'nombre': libro.datos['Nombre'].astype(str).to_numpy().repeat(total_dias),
+            'tipo': tipo,
+            'dia': [int(str(columna)) for columna in dias.columnas] * empleados,
+            'estado': dias.estados.ravel(),
+            'minutos': dias.minutos.ravel()
+        })
+
+    @staticmethod
+    def _validar_particion(periodo: str, sede: str) -> None:
+        if not PATRON_PERIODO.match(periodo):
+            raise ValueError(f"Periodo inválido: '{periodo}'. Usa el formato AAAA-MM-Q1 o AAAA-MM-Q2")
+        if not _PATRON_SEDE.match(sede) or '=' in sede or sede.startswith('.'):
+            raise ValueError(f"Sede inválida: '{sede}'. Usa letras, números, espacios, '-', '_' o '.'")
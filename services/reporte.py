@@ -1,149 +1,287 @@
+import numpy as np
 import pandas as pd
-from typing import Dict, List, Optional
-from models.asistencia import DatosAsistencia, ReporteAsistencia
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from models.asistencia import DatosAsistencia, ReporteAsistencia, LibroAsistencia
+from utils.cache import CacheLRU, huella_contenido, huella_dataframe
+from utils.config import Config
+from utils.instrumentacion import instrumentar
+from utils.tiempo import serie_a_minutos, minutos_a_tiempo
 from .asistencia import AsistenciaService
+from .historial import HistorialService
+
+# Nombres de columna del reporte consolidado y su atributo en DatosAsistencia
+# (mismo orden que los campos del dataclass)
+COLUMNAS_REPORTE = {
+    'Nombre': 'nombre',
+    'Horas Trabajadas': 'horas_trabajadas',
+    'Días Trabajados': 'dias_trabajados',
+    'Días Descanso': 'dias_descanso',
+    'Faltas': 'faltas',
+    'Registro Mal': 'registro_mal',
+    'Retardos': 'retardos',
+    'Diferencia Total': 'diferencia_total',
+    'Tiempo Extra': 'tiempo_extra'
+}
+
+# Duraciones guardadas como minutos enteros (Int32 con nulos); se formatean
+# a 'HH:MM' solo al mostrar o exportar
+COLUMNAS_DURACION = ['horas_trabajadas', 'diferencia_total', 'tiempo_extra']
+COLUMNAS_CONTEO = ['dias_trabajados', 'dias_descanso', 'registro_mal', 'retardos']
+
+def _tamano_dataframe(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+def _tamano_reporte(reporte: ReporteAsistencia) -> int:
+    """Estima la memoria de un reporte a partir de su forma tabular"""
+    return _tamano_dataframe(reporte.datos)
+
+_config = Config()
+_cache_reportes = CacheLRU(
+    max_entradas=_config.CACHE_REPORTES_MAX_ENTRADAS,
+    max_bytes=_config.CACHE_REPORTES_MAX_MB * 1024 * 1024,
+    medir_tamano=_tamano_reporte
+)
+# Resultados intermedios de cada _procesar_*, por (etapa, huella del archivo)
+_cache_etapas = CacheLRU(
+    max_entradas=_config.CACHE_ETAPAS_MAX_ENTRADAS,
+    max_bytes=_config.CACHE_ETAPAS_MAX_MB * 1024 * 1024,
+    medir_tamano=_tamano_dataframe
+)
 
 class ReporteService:
     def __init__(self):
         self.asistencia_service = AsistenciaService()
 
+    @instrumentar('reporte.generar_reporte_consolidado')
     def generar_reporte_consolidado(
         self,
-        df_horas: pd.DataFrame,
-        df_diferencia: pd.DataFrame,
-        df_retardos: pd.DataFrame,
-        df_tiempo_extra: pd.DataFrame
+        df_horas: Union[pd.DataFrame, LibroAsistencia],
+        df_diferencia: Union[pd.DataFrame, LibroAsistencia],
+        df_retardos: Union[pd.DataFrame, LibroAsistencia],
+        df_tiempo_extra: Union[pd.DataFrame, LibroAsistencia]
     ) -> ReporteAsistencia:
-        """Genera un reporte consolidado a partir de los DataFrames individuales"""
-        # 1. Crear base con nombres
-        df_base = df_horas[['Nombre']].copy()
-        
-        # 2. Procesar datos de horas
-        datos_horas = self._procesar_horas(df_horas)
-        df_datos_horas = pd.DataFrame(datos_horas)
+        """Genera un reporte consolidado a partir de los DataFrames individuales.
+
+        El resultado se guarda en caché por las huellas de los cuatro archivos,
+        así que repetir la llamada con los mismos datos no recalcula nada.
+        """
+        huellas = tuple(
+            self._huella_entrada(datos)
+            for datos in (df_horas, df_diferencia, df_retardos, df_tiempo_extra)
+        )
+        reporte = _cache_reportes.obtener(huellas)
+        if reporte is None:
+            reporte = self._construir_reporte(
+                df_horas, df_diferencia, df_retardos, df_tiempo_extra, huellas
+            )
+            _cache_reportes.guardar(huellas, reporte)
+        return reporte
+
+    def _construir_reporte(
+        self,
+        df_horas: Union[pd.DataFrame, LibroAsistencia],
+        df_diferencia: Union[pd.DataFrame, LibroAsistencia],
+        df_retardos: Union[pd.DataFrame, LibroAsistencia],
+        df_tiempo_extra: Union[pd.DataFrame, LibroAsistencia],
+        huellas: Tuple[str, str, str, str]
+    ) -> ReporteAsistencia:
+        """Calcula el reporte consolidado reutilizando las etapas ya procesadas.
+
+        Cada archivo se procesa por separado y se guarda en caché por su huella,
+        así que al reemplazar uno solo se recalcula su etapa y la consolidación.
+        """
+        huella_horas, huella_diferencia, huella_retardos, huella_tiempo_extra = huellas
+
+        # 1. Procesar datos de horas
+        df_datos_horas = self._procesar_con_cache(self._procesar_horas, df_horas, huella_horas)
         
-        # 3. Procesar datos de diferencias
-        datos_diferencias = self._procesar_diferencias(df_diferencia)
-        df_datos_diferencias = pd.DataFrame(datos_diferencias)
+        # 2. Procesar datos de diferencias
+        df_datos_diferencias = self._procesar_con_cache(
+            self._procesar_diferencias, df_diferencia, huella_diferencia
+        )
         
-        # 4. Procesar datos de retardos
-        datos_retardos = self._procesar_retardos(df_retardos)
-        df_datos_retardos = pd.DataFrame(datos_retardos)
+        # 3. Procesar datos de retardos
+        df_datos_retardos = self._procesar_con_cache(
+            self._procesar_retardos, df_retardos, huella_retardos
+        )
         
-        # 5. Procesar datos de tiempo extra
-        datos_tiempo_extra = self._procesar_tiempo_extra(df_tiempo_extra)
-        df_datos_tiempo_extra = pd.DataFrame(datos_tiempo_extra)
+        # 4. Procesar datos de tiempo extra
+        df_datos_tiempo_extra = self._procesar_con_cache(
+            self._procesar_tiempo_extra, df_tiempo_extra, huella_tiempo_extra
+        )
         
-        # 6. Consolidar todos los datos
-        df_reporte = self._consolidar_dataframes(
+        # 5. Consolidar todos los datos
+        df_reporte, duplicados = self._consolidar_dataframes(
             df_datos_horas,
             df_datos_diferencias,
             df_datos_retardos,
             df_datos_tiempo_extra
         )
         
+        # 6. Compactar tipos: categorías, enteros pequeños y minutos
+        df_reporte = self._compactar_tipos(df_reporte.rename(columns=COLUMNAS_REPORTE))
+        
         # 7. Calcular métricas generales
         metricas = self._calcular_metricas_generales(df_reporte)
         
-        # 8. Crear modelo de reporte
-        empleados = [
-            DatosAsistencia(
-                nombre=row['Nombre'],
-                horas_trabajadas=row['Horas Trabajadas'],
-                dias_trabajados=row['Días Trabajados'],
-                dias_descanso=row['Días Descanso'],
-                faltas=row['Faltas'],
-                registro_mal=row['Registro Mal'],
-                retardos=row['Retardos'],
-                diferencia_total=row['Diferencia Total'],
-                tiempo_extra=row['Tiempo Extra']
-            )
-            for _, row in df_reporte.iterrows()
-        ]
-        
+        # 8. Crear modelo de reporte (columnar, sin objetos por empleado)
         return ReporteAsistencia(
-            empleados=empleados,
+            datos=df_reporte,
             total_dias_trabajados=metricas['total_dias_trabajados'],
             total_faltas=metricas['total_faltas'],
             total_retardos=metricas['total_retardos'],
-            total_registro_mal=metricas['total_registro_mal']
+            total_registro_mal=metricas['total_registro_mal'],
+            nombres_duplicados=duplicados,
+            huella=huella_contenido('|'.join(huellas).encode())
         )
 
-    def _procesar_horas(self, df_horas: pd.DataFrame) -> List[Dict]:
+    @staticmethod
+    def guardar_en_historial(
+        reporte: ReporteAsistencia,
+        periodo: str,
+        sede: str = 'general',
+        libros: Optional[Dict[str, LibroAsistencia]] = None,
+        directorio: Optional[str] = None
+    ) -> None:
+        """Agrega el reporte (y las matrices de días de `libros`) al historial en Parquet.
+
+        El periodo usa el formato AAAA-MM-Q1 / AAAA-MM-Q2; guardar otra vez el
+        mismo periodo y sede reemplaza los datos anteriores. Requiere pyarrow.
+        """
+        HistorialService(directorio).agregar(reporte, periodo, sede, libros)
+
+    @staticmethod
+    def limpiar_cache() -> None:
+        """Vacía la caché de reportes consolidados y la de etapas intermedias"""
+        _cache_reportes.limpiar()
+        _cache_etapas.limpiar()
+
+    @staticmethod
+    def _huella_entrada(datos: Union[pd.DataFrame, LibroAsistencia]) -> str:
+        """Obtiene la huella de un archivo, calculándola si no viene del cargador"""
+        if isinstance(datos, LibroAsistencia):
+            return datos.huella or huella_dataframe(datos.datos)
+        return huella_dataframe(datos)
+
+    def _procesar_con_cache(
+        self,
+        procesar: Callable[[LibroAsistencia], pd.DataFrame],
+        datos: Union[pd.DataFrame, LibroAsistencia],
+        huella: str
+    ) -> pd.DataFrame:
+        """Ejecuta una etapa _procesar_* o reutiliza su resultado para la misma huella"""
+        clave = (procesar.__name__, huella)
+        resultado = _cache_etapas.obtener(clave)
+        if resultado is None:
+            resultado = procesar(self._como_libro(datos))
+            _cache_etapas.guardar(clave, resultado)
+        return resultado
+
+    def _como_libro(self, datos: Union[pd.DataFrame, LibroAsistencia]) -> LibroAsistencia:
+        """Obtiene el libro interpretado, parseando los días si llega un DataFrame"""
+        if isinstance(datos, LibroAsistencia):
+            return datos
+        return LibroAsistencia(datos=datos, dias=self.asistencia_service.parsear_dias(datos))
+
+    @instrumentar('reporte.procesar_horas')
+    def _procesar_horas(self, libro: LibroAsistencia) -> pd.DataFrame:
         """Procesa el DataFrame de horas trabajadas"""
-        datos = []
-        for _, fila in df_horas.iterrows():
-            datos.append({
-                'Nombre': fila['Nombre'],
-                'Horas Trabajadas': fila.get('Total de\nHoras') or fila.get('Total de Horas') or 'N/A',
-                'Días Trabajados': self.asistencia_service.contar_dias_trabajados(fila),
-                'Días Descanso': self.asistencia_service.contar_dias_descanso(fila),
-                'Faltas': fila.get('Faltas', 0) or 0
-            })
-        return datos
-
-    def _procesar_diferencias(self, df_diferencia: pd.DataFrame) -> List[Dict]:
+        df_horas = libro.datos
+        conteos = self.asistencia_service.contar_dias(libro.dias)
+        return pd.DataFrame({
+            'Nombre': df_horas['Nombre'].to_numpy(),
+            'Horas Trabajadas': self._primer_valor(df_horas, ['Total de\nHoras', 'Total de Horas'], 'N/A').to_numpy(),
+            'Días Trabajados': conteos['Días Trabajados'],
+            'Días Descanso': conteos['Días Descanso'],
+            'Faltas': self._primer_valor(df_horas, ['Faltas'], 0).to_numpy()
+        })
+
+    @instrumentar('reporte.procesar_diferencias')
+    def _procesar_diferencias(self, libro: LibroAsistencia) -> pd.DataFrame:
         """Procesa el DataFrame de diferencias"""
-        datos = []
-        for _, fila in df_diferencia.iterrows():
-            datos.append({
-                'Nombre': fila['Nombre'],
-                'Registro Mal': self.asistencia_service.contar_registro_mal(fila),
-                'Diferencia Total': fila.get('Tiempo\nTotal') or fila.get('Tiempo Total') or 'N/A'
-            })
-        return datos
-
-    def _procesar_retardos(self, df_retardos: pd.DataFrame) -> List[Dict]:
+        df_diferencia = libro.datos
+        conteos = self.asistencia_service.contar_dias(libro.dias)
+        return pd.DataFrame({
+            'Nombre': df_diferencia['Nombre'].to_numpy(),
+            'Registro Mal': conteos['Registro Mal'],
+            'Diferencia Total': self._primer_valor(df_diferencia, ['Tiempo\nTotal', 'Tiempo Total'], 'N/A').to_numpy()
+        })
+
+    @instrumentar('reporte.procesar_retardos')
+    def _procesar_retardos(self, libro: LibroAsistencia) -> pd.DataFrame:
         """Procesa el DataFrame de retardos"""
-        datos = []
-        for _, fila in df_retardos.iterrows():
-            datos.append({
-                'Nombre': fila['Nombre'],
-                'Retardos': self.asistencia_service.contar_retardos(fila)
-            })
-        return datos
-
-    def _procesar_tiempo_extra(self, df_tiempo_extra: pd.DataFrame) -> List[Dict]:
+        conteos = self.asistencia_service.contar_dias(libro.dias)
+        return pd.DataFrame({
+            'Nombre': libro.datos['Nombre'].to_numpy(),
+            'Retardos': conteos['Retardos']
+        })
+
+    @instrumentar('reporte.procesar_tiempo_extra')
+    def _procesar_tiempo_extra(self, libro: LibroAsistencia) -> pd.DataFrame:
         """Procesa el DataFrame de tiempo extra"""
-        datos = []
-        for _, fila in df_tiempo_extra.iterrows():
-            datos.append({
-                'Nombre': fila['Nombre'],
-                'Tiempo Extra': fila.get('Tiempo\nTotal') or fila.get('Tiempo Total') or 'N/A'
-            })
-        return datos
+        df_tiempo_extra = libro.datos
+        return pd.DataFrame({
+            'Nombre': df_tiempo_extra['Nombre'].to_numpy(),
+            'Tiempo Extra': self._primer_valor(df_tiempo_extra, ['Tiempo\nTotal', 'Tiempo Total'], 'N/A').to_numpy()
+        })
+
+    @staticmethod
+    def _primer_valor(df: pd.DataFrame, columnas: List[str], defecto) -> pd.Series:
+        """Toma por fila el primer valor no vacío entre las columnas dadas.
 
+        Replica `fila.get(a) or fila.get(b) or defecto`: los valores '' y 0
+        cuentan como vacíos, mientras que NaN se conserva.
+        """
+        resultado = pd.Series(defecto, index=df.index, dtype=object)
+        for columna in reversed(columnas):
+            if columna in df.columns:
+                valores = df[columna].astype(object)
+                resultado = valores.where(~valores.isin(['', 0]), resultado)
+        return resultado.infer_objects()
+
+    @instrumentar('reporte.consolidar_dataframes')
     def _consolidar_dataframes(
         self,
         df_datos_horas: pd.DataFrame,
         df_datos_diferencias: pd.DataFrame,
         df_datos_retardos: pd.DataFrame,
         df_datos_tiempo_extra: pd.DataFrame
-    ) -> pd.DataFrame:
-        """Consolida todos los DataFrames en uno solo"""
-        # Merge con horas como base
-        df_reporte = df_datos_horas.copy()
-        
-        # Merge con diferencias (left join para conservar todos los empleados)
-        df_reporte = df_reporte.merge(
-            df_datos_diferencias, 
-            on='Nombre', 
-            how='left'
-        )
+    ) -> Tuple[pd.DataFrame, Dict[str, List[str]]]:
+        """Consolida todos los DataFrames en uno solo.
+
+        Los cuatro orígenes se alinean sobre un mismo índice de empleados (los
+        nombres de horas trabajadas) en un solo concat, en lugar de encadenar
+        merges. Las filas repetidas exactas se quitan; los nombres que se
+        repiten con datos distintos (empleados homónimos) conservan todas sus
+        filas, se alinean por orden de aparición y se devuelven como conflictos.
+        """
+        fuentes = {
+            'horas': df_datos_horas,
+            'diferencias': df_datos_diferencias,
+            'retardos': df_datos_retardos,
+            'tiempo_extra': df_datos_tiempo_extra
+        }
+        duplicados: Dict[str, List[str]] = {}
+        for nombre_fuente, df_fuente in fuentes.items():
+            fuentes[nombre_fuente], conflictos = self._quitar_duplicados(df_fuente)
+            if conflictos:
+                duplicados[nombre_fuente] = conflictos
+
+        alineadas = {}
+        for nombre_fuente, df_fuente in fuentes.items():
+            if duplicados:
+                # La n-ésima aparición de un nombre se alinea con la n-ésima de las otras fuentes
+                ocurrencia = df_fuente.groupby('Nombre', sort=False).cumcount().rename('_ocurrencia')
+                alineadas[nombre_fuente] = df_fuente.set_index(['Nombre', ocurrencia])
+            else:
+                alineadas[nombre_fuente] = df_fuente.set_index('Nombre')
         
-        # Merge con retardos
-        df_reporte = df_reporte.merge(
-            df_datos_retardos, 
-            on='Nombre', 
-            how='left'
-        )
-        
-        # Merge con tiempo extra
-        df_reporte = df_reporte.merge(
-            df_datos_tiempo_extra, 
-            on='Nombre', 
-            how='left'
-        )
+        # Horas es la base: el resto se reindexa sobre sus empleados (left join)
+        empleados = alineadas.pop('horas')
+        df_reporte = pd.concat(
+            [empleados] + [df_fuente.reindex(empleados.index) for df_fuente in alineadas.values()],
+            axis=1
+        ).reset_index().drop(columns='_ocurrencia', errors='ignore')
         
         # Llenar valores faltantes con valores por defecto
         df_reporte['Registro Mal'] = df_reporte['Registro Mal'].fillna(0).astype(int)
@@ -157,17 +295,65 @@ class ReporteService:
             'Faltas', 'Registro Mal', 'Retardos', 'Diferencia Total', 'Tiempo Extra'
         ]]
         
-        return df_reporte
+        return df_reporte, duplicados
+
+    @staticmethod
+    def _quitar_duplicados(df: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
+        """Quita las filas repetidas exactas e indica los nombres que siguen repetidos
+        (con datos distintos); esas filas se conservan todas"""
+        if not df['Nombre'].duplicated().any():
+            return df, []
+        df = df.drop_duplicates()
+        conflictos = df.loc[df['Nombre'].duplicated(), 'Nombre'].unique().tolist()
+        return df, conflictos
+
+    @staticmethod
+    @instrumentar('reporte.compactar_tipos')
+    def _compactar_tipos(df_reporte: pd.DataFrame) -> pd.DataFrame:
+        """Convierte el reporte a tipos compactos para reducir su memoria"""
+        columnas = {'nombre': df_reporte['nombre'].astype('category')}
+        for columna in COLUMNAS_CONTEO:
+            columnas[columna] = df_reporte[columna].astype(np.int16)
+        faltas = pd.to_numeric(df_reporte['faltas'], errors='coerce')
+        columnas['faltas'] = faltas.astype('Int16') if (faltas.dropna() % 1 == 0).all() else faltas.astype(np.float32)
+        for columna in COLUMNAS_DURACION:
+            valores = df_reporte[columna]
+            minutos, validos = serie_a_minutos(valores, duracion=True)
+            # 'N/A' es el valor que ponen _procesar_* cuando no hay total: cuenta como vacío
+            texto = valores.astype(str).str.strip()
+            vacios = (valores.isna() | texto.isin(['', 'N/A'])).to_numpy()
+            if not (validos | vacios).all():
+                # Hay celdas con otro formato: se conserva la columna original para no perderlas
+                columnas[columna] = valores
+                continue
+            columnas[columna] = pd.Series(minutos, index=df_reporte.index).astype('Int32').where(validos)
+        return pd.DataFrame(columnas)[list(df_reporte.columns)]
 
     def _calcular_metricas_generales(self, df_reporte: pd.DataFrame) -> Dict[str, int]:
         """Calcula las métricas generales del reporte"""
         return {
-            'total_dias_trabajados': df_reporte['Días Trabajados'].sum(),
-            'total_faltas': df_reporte['Faltas'].sum(),
-            'total_retardos': df_reporte['Retardos'].sum(),
-            'total_registro_mal': df_reporte['Registro Mal'].sum()
+            'total_dias_trabajados': int(df_reporte['dias_trabajados'].sum()),
+            'total_faltas': df_reporte['faltas'].sum(),
+            'total_retardos': int(df_reporte['retardos'].sum()),
+            'total_registro_mal': int(df_reporte['registro_mal'].sum())
         }
 
     def obtener_dataframe_reporte(self, reporte: ReporteAsistencia) -> pd.DataFrame:
-        """Convierte el modelo ReporteAsistencia a un DataFrame pandas"""
-        return pd.DataFrame([vars(empleado) for empleado in reporte.empleados])
\ No newline at end of file
+        """Obtiene el DataFrame del reporte (sin copiarlo; no modificarlo)"""
+        return reporte.datos
+
+    @staticmethod
+    def formatear_reporte(df_reporte: pd.DataFrame) -> pd.DataFrame:
+        """Devuelve el reporte con las duraciones en 'HH:MM' para mostrar o exportar"""
+        return df_reporte.assign(**{
+            columna: minutos_a_tiempo(df_reporte[columna])
+            for columna in COLUMNAS_DURACION
+            if columna in df_reporte.columns and pd.api.types.is_numeric_dtype(df_reporte[columna])
+        })
+
+    @staticmethod
+    def uso_memoria(df_reporte: pd.DataFrame) -> pd.DataFrame:
+        """Memoria ocupada por cada columna del reporte (incluye el índice)"""
+        uso = df_reporte.memory_usage(index=True, deep=True)
+        tipos = df_reporte.dtypes.astype(str).reindex(uso.index, fill_value='índice')
+        return pd.DataFrame({'tipo': tipos, 'bytes': uso.astype(np.int64)})
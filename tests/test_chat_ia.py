@@ -0,0 +1,143 @@
+import json
+
+import pandas as pd
+import pytest
+import requests
+
+from services.chat_ia import ChatIAService
+
+
+class _CuerpoEnTrozos:
+    """Cuerpo HTTP falso que entrega los bytes en trozos de tamaño fijo, como un stream real"""
+
+    def __init__(self, contenido: bytes, tamano: int):
+        self.trozos = [contenido[i:i + tamano] for i in range(0, len(contenido), tamano)]
+
+    def stream(self, chunk_size=None, decode_content=True):
+        yield from self.trozos
+
+
+def _respuesta_sse(fragmentos, tamano_trozo=3, fin='stop', terminado=True) -> requests.Response:
+    elecciones = [{'delta': {'content': f}, 'finish_reason': None} for f in fragmentos]
+    if fin is not None:
+        elecciones.append({'delta': {}, 'finish_reason': fin})
+    eventos = [
+        f"data: {json.dumps({'choices': [eleccion]}, ensure_ascii=False)}\n\n" for eleccion in elecciones
+    ] + (["data: [DONE]\n\n"] if terminado else [])
+    response = requests.Response()
+    response.status_code = 200
+    response.headers['Content-Type'] = 'text/event-stream'
+    response.raw = _CuerpoEnTrozos(''.join(eventos).encode('utf-8'), tamano_trozo)
+    return response
+
+
+def test_leer_stream_decodifica_utf8():
+    fragmentos = ["```python\n", "df_reporte.nlargest(1, 'días_trabajados')", "  # Año, niño\n```"]
+    recibido = []
+
+    codigo, completa = ChatIAService._leer_stream(_respuesta_sse(fragmentos), recibido.append)
+
+    assert codigo == "df_reporte.nlargest(1, 'días_trabajados')  # Año, niño"
+    assert recibido[-1] == codigo
+    assert completa
+
+
+@pytest.mark.parametrize('fin, terminado, completa', [
+    ('stop', True, True),
+    (None, True, True),
+    ('length', True, False),
+    (None, False, False),
+])
+def test_leer_stream_indica_si_la_respuesta_esta_completa(fin, terminado, completa):
+    fragmentos = ["print(df_reporte", "['faltas'].sum())"]
+
+    codigo, resultado = ChatIAService._leer_stream(_respuesta_sse(fragmentos, fin=fin, terminado=terminado), print)
+
+    assert codigo == "print(df_reporte['faltas'].sum())"
+    assert resultado == completa
+
+
+@pytest.mark.parametrize('pregunta, esperado', [
+    ("¿Quién tiene más faltas?", ('maximo', 'faltas', 1)),
+    ("¿Quién tiene menos retardos?", ('top', 'retardos', -1)),
+    ("Top 3 empleados con más horas extra", ('top', 'tiempo_extra', 3)),
+    ("¿Quiénes tienen más días trabajados?", ('top', 'dias_trabajados', 5)),
+    ("Promedio de horas trabajadas por empleado", ('promedio', 'horas_trabajadas', 0)),
+    ("Total de faltas", ('total', 'faltas', 0)),
+    ("¿Quién tiene más faltas de todos?", ('maximo', 'faltas', 1)),
+])
+def test_intencion_local_reconoce_preguntas_simples(pregunta, esperado):
+    assert ChatIAService._intencion_local(pregunta, ['Juan Perez', 'María López']) == esperado
+
+
+@pytest.mark.parametrize('pregunta', [
+    "¿Cuántos empleados tienen más de 3 retardos?",
+    "¿Quién tiene más de 2 faltas?",
+    "Empleados con menos de 5 días trabajados",
+    "¿Quién tiene faltas mayor que 3?",
+    "Empleados con retardos menores a 10",
+    "¿Cuántas faltas hay?",
+    "Top 3 empleados con más faltas en 2024",
+    "Total de faltas de Juan Perez",
+    "Promedio de retardos del área de ventas",
+    "¿Cuántos retardos tiene María?",
+    "¿Juan tiene más faltas?",
+    "Promedio de horas trabajadas por departamento",
+    "¿Por qué hay tantas faltas?",
+    "¿Quién tiene más faltas y más retardos?",
+])
+def test_intencion_local_envia_al_modelo_filtros_y_umbrales(pregunta):
+    assert ChatIAService._intencion_local(pregunta, ['Juan Perez', 'María López']) is None
+
+
+def test_responder_localmente_ignora_nombres_del_reporte():
+    df_reporte = pd.DataFrame({'nombre': ['Juan Perez', 'Ana Ruiz'], 'faltas': [3, 1]})
+    servicio = ChatIAService()
+
+    assert servicio._responder_localmente("Total de faltas de Ana", df_reporte) is None
+    assert servicio._responder_localmente("¿Ruiz cuántas faltas tiene?", df_reporte) is None
+    texto, _, _ = servicio._responder_localmente("Total de faltas", df_reporte)
+    assert texto == "Total de faltas: 4"
+
+
+def test_print_de_groupby_con_columna_igual_al_indice():
+    df_reporte = pd.DataFrame({'nombre': ['Ana', 'Ana', 'Luis'], 'faltas': [1, 2, 3]})
+    salida = []
+
+    ChatIAService._capturar_print(salida, df_reporte.groupby('nombre')['nombre'].count())
+
+    assert len(salida) == 1
+    assert list(salida[0].columns) == ['nombre', 'nombre_valor']
+    assert salida[0]['nombre_valor'].tolist() == [2, 1]
+
+
+def test_print_de_tabla_no_convertible_se_muestra_como_texto():
+    tabla = pd.DataFrame(
+        [[1, 2], [3, 4]],
+        columns=pd.MultiIndex.from_tuples([('nombre', ''), ('faltas', 'sum')]),
+        index=pd.Index(['Ana', 'Luis'], name='nombre')
+    )
+    salida = []
+
+    ChatIAService._capturar_print(salida, tabla)
+
+    assert salida == [str(tabla) + '\n']
+
+
+def test_ejecutar_codigo_no_altera_el_reporte_compartido():
+    df_reporte = pd.DataFrame({'nombre': ['Ana', 'Luis'], 'faltas': [1, 2]})
+
+    ChatIAService()._ejecutar_codigo("df_reporte['faltas'] = 0\ndf_reporte['x'] = 1", df_reporte)
+
+    assert df_reporte.columns.tolist() == ['nombre', 'faltas']
+    assert df_reporte['faltas'].tolist() == [1, 2]
+
+
+def test_responder_localmente_envia_al_modelo_si_no_puede_calcular():
+    servicio = ChatIAService()
+    texto = pd.DataFrame({'nombre': ['Ana', 'Luis'], 'horas_trabajadas': ['08:00', 'ocho horas']})
+    vacia = pd.DataFrame({'nombre': ['Ana', 'Luis'], 'horas_trabajadas': pd.array([None, None], dtype='Int32')})
+
+    for df_reporte in (texto, vacia):
+        for pregunta in ("Promedio de horas trabajadas", "Total de horas trabajadas", "¿Quién tiene más horas trabajadas?"):
+            assert servicio._responder_localmente(pregunta, df_reporte) is None
@@ -0,0 +1,57 @@
+import pandas as pd
+
+from services.reporte import COLUMNAS_REPORTE, ReporteService
+
+
+def _fuentes(horas, diferencias=None, retardos=None, tiempo_extra=None):
+    nombres = [fila[0] for fila in horas]
+    return (
+        pd.DataFrame(horas, columns=['Nombre', 'Horas Trabajadas', 'Días Trabajados', 'Días Descanso', 'Faltas']),
+        pd.DataFrame(diferencias or [(n, 0, '00:00') for n in nombres],
+                     columns=['Nombre', 'Registro Mal', 'Diferencia Total']),
+        pd.DataFrame(retardos or [(n, 0) for n in nombres], columns=['Nombre', 'Retardos']),
+        pd.DataFrame(tiempo_extra or [(n, '00:00') for n in nombres], columns=['Nombre', 'Tiempo Extra']),
+    )
+
+
+def test_consolidar_conserva_homonimos_con_datos_distintos():
+    horas = [('Ana Ruiz', '08:00', 1, 0, 0), ('Luis Gomez', '09:00', 1, 0, 0), ('Ana Ruiz', '07:00', 1, 0, 1)]
+    retardos = [('Ana Ruiz', 2), ('Luis Gomez', 0), ('Ana Ruiz', 5)]
+
+    df_reporte, duplicados = ReporteService()._consolidar_dataframes(*_fuentes(horas, retardos=retardos))
+
+    assert df_reporte['Nombre'].tolist() == ['Ana Ruiz', 'Luis Gomez', 'Ana Ruiz']
+    assert df_reporte['Horas Trabajadas'].tolist() == ['08:00', '09:00', '07:00']
+    assert df_reporte['Retardos'].tolist() == [2, 0, 5]
+    assert duplicados == {'horas': ['Ana Ruiz'], 'retardos': ['Ana Ruiz']}
+
+
+def test_consolidar_quita_filas_repetidas_exactas():
+    horas = [('Ana Ruiz', '08:00', 1, 0, 0), ('Ana Ruiz', '08:00', 1, 0, 0)]
+
+    df_reporte, duplicados = ReporteService()._consolidar_dataframes(*_fuentes(horas))
+
+    assert df_reporte['Nombre'].tolist() == ['Ana Ruiz']
+    assert duplicados == {}
+
+
+def test_empleado_sin_horas_deja_la_columna_en_minutos():
+    horas = [('Ana Ruiz', '08:00', 1, 0, 0), ('Luis Gomez', 'N/A', 0, 0, 2)]
+    servicio = ReporteService()
+    df_reporte, _ = servicio._consolidar_dataframes(*_fuentes(horas))
+
+    df_reporte = servicio._compactar_tipos(df_reporte.rename(columns=COLUMNAS_REPORTE))
+
+    assert str(df_reporte['horas_trabajadas'].dtype) == 'Int32'
+    assert df_reporte['horas_trabajadas'].tolist() == [480, pd.NA]
+    assert df_reporte['horas_trabajadas'].mean() == 480
+
+
+def test_celda_de_duracion_mal_formada_conserva_la_columna_original():
+    horas = [('Ana Ruiz', '08:00', 1, 0, 0), ('Luis Gomez', 'ocho horas', 1, 0, 0)]
+    servicio = ReporteService()
+    df_reporte, _ = servicio._consolidar_dataframes(*_fuentes(horas))
+
+    df_reporte = servicio._compactar_tipos(df_reporte.rename(columns=COLUMNAS_REPORTE))
+
+    assert df_reporte['horas_trabajadas'].tolist() == ['08:00', 'ocho horas']
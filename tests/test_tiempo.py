@@ -0,0 +1,23 @@
+import datetime
+
+import pandas as pd
+
+from utils.tiempo import serie_a_minutos, tiempo_a_minutos
+
+
+def test_celdas_de_dias_solo_aceptan_hh_mm():
+    minutos, validos = serie_a_minutos(pd.Series(['00:15', '-02:30', '00:15:00', 'F']))
+
+    assert validos.tolist() == [True, True, False, False]
+    assert minutos.tolist() == [15, -150, 0, 0]
+    assert tiempo_a_minutos('00:15:00') == 0
+
+
+def test_duraciones_aceptan_segundos_time_y_timedelta():
+    valores = pd.Series(['08:00', '08:30:00', datetime.time(7, 45), datetime.timedelta(hours=-1, minutes=-5), None])
+
+    minutos, validos = serie_a_minutos(valores, duracion=True)
+
+    assert validos.tolist() == [True, True, True, True, False]
+    assert minutos.tolist() == [480, 510, 465, -65, 0]
+    assert tiempo_a_minutos(datetime.timedelta(hours=30), duracion=True) == 1800
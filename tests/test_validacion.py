@@ -0,0 +1,20 @@
+import pandas as pd
+import pytest
+
+from utils.validacion import es_nombre_valido, limpiar_dataframe, nombres_validos
+
+
+@pytest.mark.parametrize('nombres', [
+    ['Иван Петров', '李小龙', 'Ñ.Ñ', 'José Núñez', 'Ana Ruiz'],
+    ['Página 1', '12345', 'Total: 3', '--', 'Zoë 12:30', '²²²a'],
+])
+def test_nombres_validos_coincide_con_la_version_escalar(nombres):
+    esperado = [es_nombre_valido(nombre) for nombre in nombres]
+
+    assert nombres_validos(pd.Series(nombres)).tolist() == esperado
+
+
+def test_limpiar_dataframe_conserva_nombres_no_ascii():
+    df = pd.DataFrame({'Nombre': ['Ana Ruiz', 'Иван Петров', 'Luis Gomez', 'Página 1'], 'Total': [1, 2, 3, 4]})
+
+    assert limpiar_dataframe(df)['Nombre'].tolist() == ['Ana Ruiz', 'Иван Петров', 'Luis Gomez']
@@ -0,0 +1,172 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+import pandas as pd
+
+def huella_contenido(contenido: bytes) -> str:
+    """Calcula una huella corta del contenido de un archivo"""
+    return hashlib.blake2b(contenido, digest_size=16).hexdigest()
+
+def huella_dataframe(df: pd.DataFrame) -> str:
+    """Calcula una huella del contenido de un DataFrame (valores, índice y columnas)"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(list(df.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+class CacheLRU:
+    """Caché en memoria con expulsión LRU, límite de entradas y de tamaño total.
+
+    Es segura entre hilos, ya que Streamlit atiende cada sesión en su propio hilo.
+    Con `ttl_segundos`, las entradas más antiguas que ese plazo se descartan al leerlas.
+    """
+
+    def __init__(
+        self,
+        max_entradas: int = 16,
+        max_bytes: Optional[int] = None,
+        medir_tamano: Optional[Callable[[Any], int]] = None,
+        ttl_segundos: Optional[float] = None
+    ):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.ttl_segundos = ttl_segundos
+        self._medir_tamano = medir_tamano or (lambda valor: 0)
+        self._entradas: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._tamano_total = 0
+        self._lock = threading.Lock()
+
+    def obtener(self, clave: Hashable, defecto: Any = None) -> Any:
+        """Devuelve el valor guardado y lo marca como usado recientemente"""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return defecto
+            if entrada[2] is not None and time.monotonic() >= entrada[2]:
+                del self._entradas[clave]
+                self._tamano_total -= entrada[1]
+                return defecto
+            self._entradas.move_to_end(clave)
+            return entrada[0]
+
+    def guardar(self, clave: Hashable, valor: Any) -> None:
+        """Guarda un valor y expulsa los menos usados si se exceden los límites"""
+        tamano = self._medir_tamano(valor)
+        if self.max_entradas <= 0 or (self.max_bytes is not None and tamano > self.max_bytes):
+            return
+        with self._lock:
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self._tamano_total -= anterior[1]
+            expira = time.monotonic() + self.ttl_segundos if self.ttl_segundos else None
+            self._entradas[clave] = (valor, tamano, expira)
+            self._tamano_total += tamano
+            while len(self._entradas) > self.max_entradas or (
+                self.max_bytes is not None and self._tamano_total > self.max_bytes
+            ):
+                _, (_, tamano_expulsado, _) = self._entradas.popitem(last=False)
+                self._tamano_total -= tamano_expulsado
+
+    def limpiar(self) -> None:
+        """Elimina todas las entradas"""
+        with self._lock:
+            self._entradas.clear()
+            self._tamano_total = 0
+
+    @property
+    def tamano_total(self) -> int:
+        return self._tamano_total
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+    def __contains__(self, clave: Hashable) -> bool:
+        return clave in self._entradas
+
+class CacheDisco:
+    """Caché de archivos en un directorio, con límite de tamaño total.
+
+    Cada entrada es un archivo cuyo nombre sale de la clave. Al leerla se
+    actualiza su fecha de modificación, y al superar `max_bytes` se borran las
+    menos usadas recientemente. Las escrituras son atómicas (archivo temporal y
+    reemplazo), así que varios procesos pueden compartir el directorio.
+    """
+
+    def __init__(self, directorio: str, max_bytes: int, extension: str = ''):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self.extension = extension
+
+    def ruta(self, clave: str) -> str:
+        return os.path.join(self.directorio, re.sub(r'[^\w.-]', '_', clave) + self.extension)
+
+    def obtener(self, clave: str, leer: Callable[[str], Any]) -> Any:
+        """Lee la entrada con `leer(ruta)`; devuelve None si no existe o no se puede leer"""
+        ruta = self.ruta(clave)
+        try:
+            os.utime(ruta)
+            return leer(ruta)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Archivo dañado o de una versión anterior: se descarta
+            try:
+                os.remove(ruta)
+            except OSError:
+                pass
+            return None
+
+    def guardar(self, clave: str, escribir: Callable[[str], None]) -> None:
+        """Escribe la entrada con `escribir(ruta_temporal)` y aplica el límite de tamaño"""
+        if self.max_bytes <= 0:
+            return
+        os.makedirs(self.directorio, exist_ok=True)
+        ruta = self.ruta(clave)
+        temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            escribir(temporal)
+            os.replace(temporal, ruta)
+        finally:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+        self._expulsar()
+
+    def _expulsar(self) -> None:
+        """Borra las entradas usadas hace más tiempo hasta respetar `max_bytes`"""
+        entradas = []
+        with os.scandir(self.directorio) as iterador:
+            for entrada in iterador:
+                if entrada.is_file() and entrada.name.endswith(self.extension) and not entrada.name.endswith('.tmp'):
+                    estado = entrada.stat()
+                    entradas.append((estado.st_mtime, estado.st_size, entrada.path))
+        total = sum(tamano for _, tamano, _ in entradas)
+        for _, tamano, ruta in sorted(entradas):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(ruta)
+                total -= tamano
+            except OSError:
+                pass
+
+    def limpiar(self) -> None:
+        """Borra todas las entradas"""
+        if not os.path.isdir(self.directorio):
+            return
+        with os.scandir(self.directorio) as iterador:
+            for entrada in iterador:
+                if entrada.is_file() and entrada.name.endswith(self.extension):
+                    try:
+                        os.remove(entrada.path)
+                    except OSError:
+                        pass
+
+    def tamano_total(self) -> int:
+        if not os.path.isdir(self.directorio):
+            return 0
+        with os.scandir(self.directorio) as iterador:
+            return sum(e.stat().st_size for e in iterador if e.is_file() and e.name.endswith(self.extension))
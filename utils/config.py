@@ -4,4 +4,80 @@ from dotenv import load_dotenv
 class Config:
     def __init__(self):
         load_dotenv()
-        self.GROQ_API_KEY = os.getenv("GROQ_API_KEY", "tu_api_key_aqui")
\ No newline at end of file
+        self.GROQ_API_KEY = os.getenv("GROQ_API_KEY", "tu_api_key_aqui")
+
+        # Caché de archivos Excel ya procesados (por huella del contenido)
+        self.CACHE_ARCHIVOS_MAX_ENTRADAS = int(os.getenv("CACHE_ARCHIVOS_MAX_ENTRADAS", "16"))
+        self.CACHE_ARCHIVOS_MAX_MB = int(os.getenv("CACHE_ARCHIVOS_MAX_MB", "256"))
+
+        # Caché de reportes consolidados y de sus etapas intermedias por archivo
+        self.CACHE_REPORTES_MAX_ENTRADAS = int(os.getenv("CACHE_REPORTES_MAX_ENTRADAS", "8"))
+        self.CACHE_REPORTES_MAX_MB = int(os.getenv("CACHE_REPORTES_MAX_MB", "128"))
+        self.CACHE_ETAPAS_MAX_ENTRADAS = int(os.getenv("CACHE_ETAPAS_MAX_ENTRADAS", "32"))
+        self.CACHE_ETAPAS_MAX_MB = int(os.getenv("CACHE_ETAPAS_MAX_MB", "64"))
+
+        # Caché de archivos exportados (Excel, CSV, Parquet) por huella del reporte
+        self.CACHE_EXPORTACIONES_MAX_ENTRADAS = int(os.getenv("CACHE_EXPORTACIONES_MAX_ENTRADAS", "8"))
+        self.CACHE_EXPORTACIONES_MAX_MB = int(os.getenv("CACHE_EXPORTACIONES_MAX_MB", "64"))
+
+        # Directorio del historial de reportes en Parquet (particionado por periodo y sede)
+        self.HISTORIAL_DIR = os.getenv("HISTORIAL_DIR", "historial")
+
+        # Base de las cachés en disco con datos de empleados: fuera del proyecto
+        cache_usuario = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+
+        # Caché en disco (Arrow) de archivos ya parseados, en el directorio de caché
+        # del usuario (contiene datos de empleados); 0 MB la desactiva
+        self.CACHE_DISCO_DIR = os.getenv("CACHE_DISCO_DIR", os.path.join(cache_usuario, "asistencia", "libros"))
+        self.CACHE_DISCO_MAX_MB = int(os.getenv("CACHE_DISCO_MAX_MB", "512"))
+
+        # Cliente HTTP del modelo: URL (se puede apuntar a un servidor local para pruebas),
+        # tiempos de espera en segundos y reintentos con espera exponencial en 429/5xx
+        self.IA_API_URL = os.getenv("IA_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+        self.IA_TIMEOUT_CONEXION = float(os.getenv("IA_TIMEOUT_CONEXION", "5"))
+        self.IA_TIMEOUT_LECTURA = float(os.getenv("IA_TIMEOUT_LECTURA", "30"))
+        self.IA_REINTENTOS = int(os.getenv("IA_REINTENTOS", "3"))
+        self.IA_REINTENTOS_ESPERA = float(os.getenv("IA_REINTENTOS_ESPERA", "0.5"))
+        self.IA_CONEXIONES_MAX = int(os.getenv("IA_CONEXIONES_MAX", "4"))
+        # Pide la respuesta en streaming para mostrar el código mientras se genera
+        self.IA_STREAMING = os.getenv("IA_STREAMING", "1").lower() in ("1", "true", "si", "sí")
+
+        # Responde sin llamar al modelo las preguntas simples (máximo, top, promedio, total de una métrica)
+        self.IA_RESPUESTAS_LOCALES = os.getenv("IA_RESPUESTAS_LOCALES", "1").lower() in ("1", "true", "si", "sí")
+
+        # Resumen del reporte que se envía en el prompt: columnas descritas, tamaño
+        # máximo en caracteres y resúmenes que se conservan (uno por reporte)
+        self.IA_CONTEXTO_MAX_COLUMNAS = int(os.getenv("IA_CONTEXTO_MAX_COLUMNAS", "30"))
+        self.IA_CONTEXTO_MAX_CARACTERES = int(os.getenv("IA_CONTEXTO_MAX_CARACTERES", "4000"))
+        self.CACHE_IA_CONTEXTOS_MAX_ENTRADAS = int(os.getenv("CACHE_IA_CONTEXTOS_MAX_ENTRADAS", "8"))
+
+        # Caché de código generado por el modelo (por pregunta y datos del reporte);
+        # 0 horas = sin caducidad. La copia en disco es opcional
+        self.CACHE_IA_MAX_ENTRADAS = int(os.getenv("CACHE_IA_MAX_ENTRADAS", "64"))
+        self.CACHE_IA_TTL_HORAS = float(os.getenv("CACHE_IA_TTL_HORAS", "24"))
+        self.CACHE_IA_DISCO = os.getenv("CACHE_IA_DISCO", "0").lower() in ("1", "true", "si", "sí")
+        self.CACHE_IA_DIR = os.getenv("CACHE_IA_DIR", os.path.join(cache_usuario, "asistencia", "ia"))
+        self.CACHE_IA_MAX_MB = int(os.getenv("CACHE_IA_MAX_MB", "16"))
+
+        # Ejecución del código generado en procesos aparte, con límites por consulta.
+        # EJECUCION_DATOS_DIR vacío = /dev/shm (o el directorio temporal si no existe)
+        self.EJECUCION_AISLADA = os.getenv("EJECUCION_AISLADA", "1").lower() in ("1", "true", "si", "sí")
+        self.EJECUCION_PROCESOS = int(os.getenv("EJECUCION_PROCESOS", "2"))
+        self.EJECUCION_LIMITE_SEGUNDOS = float(os.getenv("EJECUCION_LIMITE_SEGUNDOS", "10"))
+        self.EJECUCION_LIMITE_CPU_SEGUNDOS = float(os.getenv("EJECUCION_LIMITE_CPU_SEGUNDOS", "5"))
+        self.EJECUCION_LIMITE_MEMORIA_MB = int(os.getenv("EJECUCION_LIMITE_MEMORIA_MB", "1024"))
+        self.EJECUCION_DATOS_DIR = os.getenv("EJECUCION_DATOS_DIR", "")
+        self.EJECUCION_DATOS_MAX_MB = int(os.getenv("EJECUCION_DATOS_MAX_MB", "256"))
+
+        # Carga en paralelo de archivos Excel (0 procesos = número de CPUs)
+        self.CARGA_PARALELA_PROCESOS = int(os.getenv("CARGA_PARALELA_PROCESOS", "4"))
+        self.CARGA_PARALELA_MIN_KB = int(os.getenv("CARGA_PARALELA_MIN_KB", "256"))
+
+        # Lector de Excel: 'streaming' (openpyxl solo lectura, se detiene en el pie),
+        # 'pandas' (pd.read_excel completo) o 'calamine' (si python-calamine está instalado)
+        self.MOTOR_EXCEL = os.getenv("MOTOR_EXCEL", "streaming")
+
+        # Medición de etapas (tiempo, filas y pico de memoria); apagada por defecto
+        self.INSTRUMENTACION = os.getenv("INSTRUMENTACION", "0").lower() in ("1", "true", "si", "sí")
+        self.INSTRUMENTACION_MAX_MEDICIONES = int(os.getenv("INSTRUMENTACION_MAX_MEDICIONES", "200"))
+        self.INSTRUMENTACION_MEMORIA = os.getenv("INSTRUMENTACION_MEMORIA", "1").lower() in ("1", "true", "si", "sí")
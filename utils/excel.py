@@ -0,0 +1,107 @@
+import io
+import importlib.util
+import numpy as np
+import pandas as pd
+from typing import Callable, Dict, List, Union
+from pandas.io.parsers import TextParser
+from utils.validacion import es_nombre_valido
+
+# Fila (base 0) donde están los encabezados de los reportes quincenales
+FILA_ENCABEZADO = 2
+
+# Textos que pandas interpreta como nulos por defecto al leer Excel
+_VALORES_NULOS = {
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+    '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+}
+
+def leer_excel_pandas(contenido: bytes, hoja: Union[int, str] = 0) -> pd.DataFrame:
+    """Lee la hoja completa con pd.read_excel (openpyxl para .xlsx)"""
+    return pd.read_excel(io.BytesIO(contenido), sheet_name=hoja, header=FILA_ENCABEZADO)
+
+def leer_excel_calamine(contenido: bytes, hoja: Union[int, str] = 0) -> pd.DataFrame:
+    """Lee la hoja con el motor calamine (Rust); requiere python-calamine"""
+    return pd.read_excel(io.BytesIO(contenido), sheet_name=hoja, header=FILA_ENCABEZADO, engine='calamine')
+
+def leer_excel_streaming(contenido: bytes, hoja: Union[int, str] = 0) -> pd.DataFrame:
+    """Lee la hoja fila por fila con openpyxl en modo solo lectura.
+
+    Se detiene en la primera fila cuyo 'Nombre' no es válido (el pie con
+    "Página ..."), así que nunca carga el resto de la hoja. Convierte las
+    celdas igual que pandas, de modo que tras limpiar_dataframe el resultado
+    coincide con leer_excel_pandas. Los archivos que no son .xlsx (p. ej. .xls)
+    se leen con leer_excel_pandas.
+    """
+    if not contenido.startswith(b'PK'):
+        return leer_excel_pandas(contenido, hoja)
+
+    from openpyxl import load_workbook
+    from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+
+    def convertir(celda):
+        if celda.value is None:
+            return ''
+        if celda.data_type == TYPE_ERROR:
+            return np.nan
+        if celda.data_type == TYPE_NUMERIC:
+            entero = int(celda.value)
+            return entero if entero == celda.value else float(celda.value)
+        return celda.value
+
+    libro = load_workbook(io.BytesIO(contenido), read_only=True, data_only=True, keep_links=False)
+    try:
+        if isinstance(hoja, int):
+            if not 0 <= hoja < len(libro.worksheets):
+                raise ValueError(f"La hoja {hoja} no existe; el archivo tiene {len(libro.worksheets)} hoja(s)")
+            hoja_excel = libro.worksheets[hoja]
+        else:
+            hoja_excel = libro[hoja]
+        hoja_excel.reset_dimensions()
+
+        filas: List[list] = []
+        indice_nombre = None
+        for numero, fila in enumerate(hoja_excel.iter_rows()):
+            valores = [convertir(celda) for celda in fila]
+            while valores and valores[-1] == '':
+                valores.pop()
+            if numero < FILA_ENCABEZADO:
+                continue
+            if numero == FILA_ENCABEZADO:
+                indice_nombre = valores.index('Nombre') if 'Nombre' in valores else None
+            elif indice_nombre is not None and indice_nombre < len(valores):
+                nombre = valores[indice_nombre]
+                es_nulo = isinstance(nombre, str) and nombre in _VALORES_NULOS
+                if not es_nulo and not pd.isna(nombre) and not es_nombre_valido(nombre):
+                    break
+            filas.append(valores)
+    finally:
+        libro.close()
+
+    if not filas:
+        raise ValueError(f"La hoja no tiene encabezados en la fila {FILA_ENCABEZADO + 1}")
+
+    ancho = max(len(fila) for fila in filas)
+    filas = [fila + [''] * (ancho - len(fila)) for fila in filas]
+    return TextParser(filas, header=0).read()
+
+MOTORES_EXCEL: Dict[str, Callable[[bytes, Union[int, str]], pd.DataFrame]] = {
+    'pandas': leer_excel_pandas,
+    'streaming': leer_excel_streaming,
+    'calamine': leer_excel_calamine
+}
+
+def registrar_motor_excel(nombre: str, lector: Callable[[bytes, Union[int, str]], pd.DataFrame]) -> None:
+    """Registra un lector adicional; debe ser una función de módulo para poder usarse en el pool"""
+    MOTORES_EXCEL[nombre] = lector
+
+def obtener_lector_excel(nombre: str) -> Callable[[bytes, Union[int, str]], pd.DataFrame]:
+    """Devuelve el lector del motor indicado.
+
+    'calamine' solo se usa si python-calamine está instalado; si no, se usa
+    'streaming'. Un nombre desconocido produce ValueError.
+    """
+    if nombre == 'calamine' and importlib.util.find_spec('python_calamine') is None:
+        nombre = 'streaming'
+    if nombre not in MOTORES_EXCEL:
+        raise ValueError(f"Motor de Excel desconocido: '{nombre}'. Opciones: {', '.join(MOTORES_EXCEL)}")
+    return MOTORES_EXCEL[nombre]
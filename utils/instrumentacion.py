@@ -0,0 +1,201 @@
+"""Medición de etapas: tiempo, filas procesadas y pico de memoria.
+
+Desactivada por defecto. La variable INSTRUMENTACION la enciende para todo
+el proceso; `medir_en_sesion` la enciende solo en el hilo que atiende una
+sesión de Streamlit y etiqueta sus mediciones, para que cada sesión vea (y
+limpie) únicamente las suyas. Apagada, `instrumentar` solo revisa una bandera
+antes de llamar a la función y `medir` devuelve un contexto vacío compartido.
+Encendida, cada medición se emite como una línea JSON en el logger
+'asistencia.instrumentacion' y se guarda en un historial reciente para el
+panel de diagnóstico.
+
+El pico de memoria se obtiene con tracemalloc (solo memoria asignada por
+Python/numpy). Como tracemalloc afecta a todo el proceso, solo se usa cuando
+la instrumentación se activa por configuración, no desde una sesión.
+"""
+import functools
+import json
+import logging
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import nullcontext
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import pandas as pd
+
+from utils.config import Config
+
+logger = logging.getLogger('asistencia.instrumentacion')
+if not logger.handlers:
+    # Una línea JSON por medición en stderr, sin el prefijo del logger raíz
+    _manejador = logging.StreamHandler()
+    _manejador.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_manejador)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+@dataclass
+class Medicion:
+    etapa: str
+    segundos: float = 0.0
+    filas: Optional[int] = None
+    memoria_pico_kb: Optional[float] = None
+    inicio: float = 0.0
+    sesion: Optional[str] = None
+    detalles: Dict[str, Any] = field(default_factory=dict)
+
+class _Estado:
+    def __init__(self, activa: bool, max_mediciones: int):
+        self.activa = activa
+        self.mediciones: Deque[Medicion] = deque(maxlen=max_mediciones)
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+_config = Config()
+_estado = _Estado(_config.INSTRUMENTACION, _config.INSTRUMENTACION_MAX_MEDICIONES)
+_CONTEXTO_NULO = nullcontext()
+
+def _sesion_actual() -> Optional[str]:
+    return getattr(_estado.local, 'sesion', None)
+
+def _midiendo() -> bool:
+    return _estado.activa or getattr(_estado.local, 'sesion', None) is not None
+
+def instrumentacion_activa() -> bool:
+    """Indica si se mide en el hilo actual (por configuración o por sesión)"""
+    return _midiendo()
+
+def medir_en_sesion(sesion: Optional[str]) -> None:
+    """Mide (o deja de medir, con None) las etapas que se ejecuten en este hilo.
+
+    Streamlit atiende cada ejecución de una sesión en su propio hilo, así que
+    se llama al inicio de cada ejecución con el identificador de la sesión.
+    """
+    _estado.local.sesion = sesion
+
+def activar_instrumentacion(activa: bool = True, memoria: bool = True) -> None:
+    """Enciende o apaga la medición en todo el proceso (uso administrativo, no por sesión).
+
+    Medir memoria activa tracemalloc, que hace más lentas las asignaciones;
+    con memoria=False solo se miden tiempos y filas.
+    """
+    _estado.activa = activa
+    if activa and memoria and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif (not activa or not memoria) and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+def obtener_mediciones(sesion: Optional[str] = None) -> List[Medicion]:
+    """Mediciones recientes, de la más nueva a la más antigua (solo las de `sesion` si se indica)"""
+    with _estado.lock:
+        return [m for m in reversed(_estado.mediciones) if sesion is None or m.sesion == sesion]
+
+def limpiar_mediciones(sesion: Optional[str] = None) -> None:
+    """Borra las mediciones (solo las de `sesion` si se indica)"""
+    with _estado.lock:
+        if sesion is None:
+            _estado.mediciones.clear()
+            return
+        conservar = [m for m in _estado.mediciones if m.sesion != sesion]
+        _estado.mediciones.clear()
+        _estado.mediciones.extend(conservar)
+
+def mediciones_a_dataframe(mediciones: List[Medicion]) -> pd.DataFrame:
+    """Tabla de mediciones para mostrar en el panel de diagnóstico"""
+    return pd.DataFrame(
+        [{'etapa': m.etapa, 'ms': round(m.segundos * 1000, 2), 'filas': m.filas,
+          'memoria_pico_kb': m.memoria_pico_kb} for m in mediciones],
+        columns=['etapa', 'ms', 'filas', 'memoria_pico_kb']
+    )
+
+def contar_filas(objeto) -> Optional[int]:
+    """Filas de un DataFrame, de un objeto con `.datos` (libro o reporte) o del primero de una tupla"""
+    if isinstance(objeto, tuple):
+        objeto = objeto[0] if objeto else None
+    if hasattr(objeto, 'datos'):
+        objeto = objeto.datos
+    if isinstance(objeto, (pd.DataFrame, pd.Series)):
+        return len(objeto)
+    return None
+
+class _Medidor:
+    """Contexto que mide una etapa; anidable (el pico de memoria incluye a las etapas internas)"""
+
+    def __init__(self, etapa: str, detalles: Dict[str, Any]):
+        self.medicion = Medicion(etapa=etapa, sesion=_sesion_actual(), detalles=detalles)
+        self._memoria_inicial = 0
+        self._pico_hijos = 0
+
+    def __enter__(self) -> Medicion:
+        pila = getattr(_estado.local, 'pila', None)
+        if pila is None:
+            pila = _estado.local.pila = []
+        if tracemalloc.is_tracing():
+            actual, pico = tracemalloc.get_traced_memory()
+            if pila:
+                pila[-1]._pico_hijos = max(pila[-1]._pico_hijos, pico)
+            tracemalloc.reset_peak()
+            self._memoria_inicial = actual
+        pila.append(self)
+        self.medicion.inicio = time.time()
+        self._reloj = time.perf_counter()
+        return self.medicion
+
+    def __exit__(self, tipo, error, traza) -> None:
+        self.medicion.segundos = time.perf_counter() - self._reloj
+        pila = _estado.local.pila
+        pila.pop()
+        if tracemalloc.is_tracing():
+            pico = max(tracemalloc.get_traced_memory()[1], self._pico_hijos)
+            self.medicion.memoria_pico_kb = round(max(pico - self._memoria_inicial, 0) / 1024, 1)
+            if pila:
+                pila[-1]._pico_hijos = max(pila[-1]._pico_hijos, pico)
+        if error is not None:
+            self.medicion.detalles['error'] = type(error).__name__
+        _registrar(self.medicion)
+
+def _registrar(medicion: Medicion) -> None:
+    with _estado.lock:
+        _estado.mediciones.append(medicion)
+    if logger.isEnabledFor(logging.INFO):
+        datos = asdict(medicion)
+        datos['segundos'] = round(datos['segundos'], 6)
+        logger.info(json.dumps(datos, ensure_ascii=False, default=str))
+
+def medir(etapa: str, **detalles):
+    """Contexto para medir un bloque: `with medir('etapa') as m: ...; if m: m.filas = n`.
+
+    Si la instrumentación está apagada, `m` es None.
+    """
+    if not _midiendo():
+        return _CONTEXTO_NULO
+    return _Medidor(etapa, detalles)
+
+def instrumentar(etapa: str, filas: Optional[Callable[..., Optional[int]]] = None):
+    """Decorador que mide cada llamada a la función.
+
+    Las filas se toman del resultado (o, si no es tabular, del primer argumento
+    que lo sea); `filas` permite indicar otra forma de contarlas a partir del
+    resultado.
+    """
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not _midiendo():
+                return funcion(*args, **kwargs)
+            with _Medidor(etapa, {}) as medicion:
+                resultado = funcion(*args, **kwargs)
+                medicion.filas = filas(resultado) if filas else contar_filas(resultado)
+                if medicion.filas is None:
+                    medicion.filas = next(
+                        (n for n in map(contar_filas, (*args, *kwargs.values())) if n is not None), None
+                    )
+            return resultado
+        return envoltura
+    return decorador
+
+if _estado.activa:
+    activar_instrumentacion(True, _config.INSTRUMENTACION_MEMORIA)
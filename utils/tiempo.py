@@ -1,21 +1,77 @@
+import datetime
+import re
+import numpy as np
 import pandas as pd
+from typing import Tuple
 
-def tiempo_a_minutos(tiempo_str) -> int:
-    """Convierte HH:MM a minutos"""
+# Signo opcional y exactamente dos partes enteras; admite totales mayores a 24h
+PATRON_TIEMPO = r'^\s*(-?)\s*([+-]?\d+)\s*:\s*([+-]?\d+)\s*$'
+_REGEX_TIEMPO = re.compile(PATRON_TIEMPO)
+# Columnas de totales (duraciones): además admite segundos, que se descartan.
+# Las celdas de días siguen usando PATRON_TIEMPO.
+PATRON_DURACION = r'^\s*(-?)\s*([+-]?\d+)\s*:\s*([+-]?\d+)(?:\s*:\s*\d+(?:\.\d+)?)?\s*$'
+_REGEX_DURACION = re.compile(PATRON_DURACION)
+
+def _duracion_a_texto(valor):
+    """Pasa a 'H:MM' las horas (datetime.time) y duraciones (timedelta) que entrega openpyxl"""
+    if isinstance(valor, datetime.time):
+        return f"{valor.hour}:{valor.minute:02d}"
+    if isinstance(valor, datetime.timedelta):
+        total = int(valor.total_seconds() / 60)
+        return f"{'-' if total < 0 else ''}{abs(total) // 60}:{abs(total) % 60:02d}"
+    return valor
+
+def tiempo_a_minutos(tiempo_str, duracion: bool = False) -> int:
+    """Convierte HH:MM a minutos; con `duracion` acepta también HH:MM:SS, time y timedelta"""
+    if duracion:
+        tiempo_str = _duracion_a_texto(tiempo_str)
     if pd.isna(tiempo_str) or tiempo_str in ['F', 'N/L', 'J']:
         return 0
-    try:
-        tiempo_str = str(tiempo_str).strip()
-        es_negativo = tiempo_str.startswith('-')
-        if es_negativo:
-            tiempo_str = tiempo_str[1:]
-        horas, minutos = map(int, tiempo_str.split(':'))
-        total = horas * 60 + minutos
-        return -total if es_negativo else total
-    except:
+    coincidencia = (_REGEX_DURACION if duracion else _REGEX_TIEMPO).match(str(tiempo_str))
+    if coincidencia is None:
         return 0
+    signo, horas, minutos = coincidencia.groups()
+    total = int(horas) * 60 + int(minutos)
+    return -total if signo else total
 
 def tiempo_a_horas_decimales(tiempo_str) -> float:
     """Convierte HH:MM a horas decimales"""
     minutos = tiempo_a_minutos(tiempo_str)
-    return minutos / 60.0
\ No newline at end of file
+    return minutos / 60.0
+
+def serie_a_minutos(valores, duracion: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """Convierte una columna completa de 'HH:MM' / '-HH:MM' a minutos.
+
+    Con `duracion` (columnas de totales) también acepta 'HH:MM:SS' (los
+    segundos se descartan) y celdas con datetime.time o timedelta. Devuelve
+    (minutos, validos): los minutos como int64 y una máscara que indica qué
+    celdas tenían formato de tiempo. Las celdas no válidas (vacías, códigos o
+    texto mal formado) quedan en 0 y en False.
+    """
+    serie = pd.Series(valores, copy=False)
+    if duracion and pd.api.types.is_timedelta64_dtype(serie):
+        serie = serie.map(_duracion_a_texto, na_action='ignore')
+    elif duracion and serie.dtype == object:
+        serie = serie.map(_duracion_a_texto)
+    texto = serie.astype(str)
+    partes = texto.str.extract(PATRON_DURACION if duracion else PATRON_TIEMPO)
+    validos = partes[1].notna().to_numpy()
+    minutos = np.zeros(len(texto), dtype=np.int64)
+    if validos.any():
+        total = (partes.loc[validos, 1].astype(np.int64).to_numpy() * 60
+                 + partes.loc[validos, 2].astype(np.int64).to_numpy())
+        negativos = (partes.loc[validos, 0] == '-').to_numpy()
+        minutos[validos] = np.where(negativos, -total, total)
+    return minutos, validos
+
+def minutos_a_tiempo(minutos, vacio: str = 'N/A') -> pd.Series:
+    """Da formato 'HH:MM' / '-HH:MM' a una columna de minutos; los nulos quedan como `vacio`"""
+    serie = pd.Series(minutos, copy=False)
+    valores = serie.to_numpy(dtype='float64', na_value=np.nan)
+    nulos = np.isnan(valores)
+    enteros = np.where(nulos, 0, valores).astype(np.int64)
+    absolutos = np.abs(enteros)
+    texto = (pd.Series(absolutos // 60, index=serie.index).astype(str).str.zfill(2) + ':'
+             + pd.Series(absolutos % 60, index=serie.index).astype(str).str.zfill(2))
+    texto = texto.where(enteros >= 0, '-' + texto)
+    return texto.where(~nulos, vacio)
\ No newline at end of file
@@ -1,4 +1,8 @@
+import numpy as np
 import pandas as pd
+from utils.instrumentacion import instrumentar
+
+_PATRONES_INVALIDOS = r'página|:|--|;;|\.\.'
 
 def es_nombre_valido(nombre) -> bool:
     """Valida si un string es un nombre válido"""
@@ -14,24 +18,41 @@ def es_nombre_valido(nombre) -> bool:
         return False
     return True
 
+def nombres_validos(nombres: pd.Series) -> np.ndarray:
+    """Aplica es_nombre_valido a toda una columna con métodos de texto de pandas.
+
+    A diferencia de la versión escalar, los valores nulos se consideran inválidos.
+    Los nombres con caracteres no ASCII se validan con la versión escalar: las
+    expresiones regulares de los textos Arrow tratan \\W y \\d como solo ASCII.
+    """
+    texto = nombres.astype(str).str.strip()
+    largo = texto.str.len()
+    # Contar lo que no es letra es más rápido: en un nombre casi todo son letras
+    letras = largo - texto.str.count(r'[\W\d_]')
+    numeros_y_simbolos = texto.str.count(r'[\d:\-.,;]')
+    validos = (
+        (largo >= 3)
+        & ~texto.str.isdigit()
+        & (letras > 0)
+        & (numeros_y_simbolos <= letras)
+        & ~texto.str.lower().str.contains(_PATRONES_INVALIDOS, regex=True)
+    )
+    no_ascii = texto.str.contains(r'[^\x00-\x7f]', regex=True).fillna(False).astype(bool)
+    if no_ascii.any():
+        validos = validos.copy()
+        validos[no_ascii] = texto[no_ascii].map(es_nombre_valido)
+    return validos.to_numpy(dtype=bool)
+
+@instrumentar('limpiar_dataframe')
 def limpiar_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     """Limpia un DataFrame de asistencias"""
     # Filtrar filas donde el campo 'Nombre' no sea nulo
     df = df[df['Nombre'].notna()].reset_index(drop=True)
     
-    # Encontrar la última fila válida con nombre
-    ultima_fila_valida = -1
-    for i, fila in df.iterrows():
-        if es_nombre_valido(fila['Nombre']):
-            ultima_fila_valida = i
-        else:
-            break
-    
-    # Cortar solo hasta la última fila válida
-    if ultima_fila_valida != -1:
-        df = df.iloc[:ultima_fila_valida + 1].reset_index(drop=True)
-    else:
-        df = df.iloc[0:0]
+    # Cortar antes de la primera fila con nombre inválido (pie del reporte)
+    invalidos = ~nombres_validos(df['Nombre'])
+    fin = int(invalidos.argmax()) if invalidos.any() else len(df)
+    df = df.iloc[:fin].reset_index(drop=True)
     
     # Eliminar columnas sin nombre claro
     df = df.loc[:, ~df.columns.astype(str).str.startswith("Unnamed")]